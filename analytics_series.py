@@ -0,0 +1,105 @@
+import math
+from datetime import datetime, timezone
+
+from app import db
+from models import ArtworkObservation
+
+BUCKETS = {'minute': 60, 'hour': 3600, 'day': 86400}
+GROUP_COLUMNS = {'artwork': ArtworkObservation.artwork_id, 'camera': ArtworkObservation.camera_id}
+SUM_COLUMNS = ('total_time', 'section_1_time', 'section_2_time', 'section_3_time')
+
+def _epoch(column):
+    """SQL expression for a (naive UTC) DateTime column as epoch seconds"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return db.cast(db.func.strftime('%s', column), db.Integer)
+    if dialect in ('mysql', 'mariadb'):
+        return db.func.unix_timestamp(column)
+    return db.extract('epoch', column)
+
+def _to_epoch(value):
+    """Epoch seconds of a naive UTC datetime"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def bucket_starts(start, end, width):
+    """Epoch seconds of each point: start rounded down to a multiple of width, up to end"""
+    first = int(_to_epoch(start)) // width * width
+    return range(first, int(_to_epoch(end)), width)
+
+def bucket_width(start, end, bucket, max_points):
+    """
+    Seconds per point: the requested bucket, widened to a whole multiple of
+    it when the range would otherwise need more than max_points points
+    (counted from start rounded down to a bucket boundary)
+    """
+    width = BUCKETS[bucket]
+    span = max((end - start).total_seconds(), 1)
+    multiple = max(1, math.ceil(span / width / max_points))
+    while len(bucket_starts(start, end, width * multiple)) > max_points:
+        multiple += 1
+    return width * multiple
+
+def series(start, end, bucket='hour', max_points=500, group_by=None, artwork_id=None,
+           camera_id=None, max_series=20):
+    """
+    Visitor counts, dwell and section sums of ArtworkObservation rows in
+    [start, end), aggregated into time buckets by the database.
+    Args:
+        start, end: Naive UTC datetimes bounding the range
+        bucket: 'minute', 'hour' or 'day'
+        max_points: Upper bound on points per series; buckets are widened to fit
+        group_by: None for a single series, or 'artwork' / 'camera' for one
+            series per artwork or camera (the max_series with the most dwell)
+        artwork_id, camera_id: Restrict to one artwork and/or camera
+    Returns:
+        {'bucket_seconds', 'series': [{'key', 'points': [...]}, ...]}, with
+        empty buckets filled in as zero points
+    """
+    width = bucket_width(start, end, bucket, max_points)
+    # Zero-time rows only mark session ends, as in the rollups
+    filters = [ArtworkObservation.start_time >= start, ArtworkObservation.start_time < end,
+               ArtworkObservation.total_time > 0]
+    if artwork_id:
+        filters.append(ArtworkObservation.artwork_id == artwork_id)
+    if camera_id:
+        filters.append(ArtworkObservation.camera_id == camera_id)
+
+    keys = [GROUP_COLUMNS[group_by]] if group_by else []
+    if group_by:
+        key = keys[0]
+        top_keys = db.session.query(key)\
+            .filter(*filters)\
+            .group_by(key)\
+            .order_by(db.func.sum(ArtworkObservation.total_time).desc())\
+            .limit(max_series)
+        filters.append(key.in_([row[0] for row in top_keys]))
+
+    bucket_start = (_epoch(ArtworkObservation.start_time) // width * width).label('bucket_start')
+    rows = db.session.query(
+        *keys,
+        bucket_start,
+        db.func.count(ArtworkObservation.id),
+        db.func.count(db.distinct(ArtworkObservation.aruco_id)),
+        *(db.func.coalesce(db.func.sum(getattr(ArtworkObservation, column)), 0.0) for column in SUM_COLUMNS)
+    ).filter(*filters).group_by(*keys, bucket_start).order_by(*keys, bucket_start).all()
+
+    grouped = {} if group_by else {'all': {}}
+    for row in rows:
+        row_key = row[0] if group_by else 'all'
+        row_start, observations, visitors, total_time, *sections = row[len(keys):]
+        grouped.setdefault(row_key, {})[int(row_start)] = {
+            'observations': observations,
+            'visitors': visitors,
+            'total_time': round(float(total_time), 1),
+            'section_times': {f'section_{n}': round(float(value), 1) for n, value in enumerate(sections, start=1)}
+        }
+
+    starts = bucket_starts(start, end, width)
+    empty = {'observations': 0, 'visitors': 0, 'total_time': 0.0,
+             'section_times': {f'section_{n}': 0.0 for n in range(1, len(SUM_COLUMNS))}}
+    iso = lambda epoch: datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+    return {
+        'bucket_seconds': width,
+        'series': [{'key': row_key, 'points': [dict(points.get(b, empty), start=iso(b)) for b in starts]}
+                   for row_key, points in grouped.items()]
+    }
@@ -4,6 +4,7 @@ import time
 from flask import Flask, render_template, Response, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
+from threading import Lock
 from sqlalchemy.orm import DeclarativeBase
 import json
 
@@ -22,34 +23,102 @@ def create_app():
     app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev_key_123")
 
     # Configure PostgreSQL database
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
+    database_url = os.environ.get('DATABASE_URL')
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
         "pool_recycle": 300,
         "pool_pre_ping": True,
     }
 
+    # SQLite files get WAL, tuned pragmas and a thread-sized pool unless
+    # SQLITE_PROFILE=default
+    import sqlite_profile
+    tune_sqlite = sqlite_profile.is_sqlite_file(database_url) and \
+        os.environ.get('SQLITE_PROFILE', 'tuned') == 'tuned'
+    if tune_sqlite:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(sqlite_profile.engine_options())
+
     # Initialize database with app
     db.init_app(app)
+    if tune_sqlite:
+        with app.app_context():
+            sqlite_profile.apply(db.engine)
 
-    from models import CheckIn, Camera as DBCamera, ArtworkObservation, ObservationEvent
+    from models import CheckIn, Camera as DBCamera, ArtworkObservation, ObservationEvent, Region, \
+        ArtworkDailyStats, ArtworkHeatmap, DailyVisitor, MAX_SECTIONS
     from camera import Camera as VideoCamera
     from aruco_processor import ArucoProcessor
+    from frame_pipeline import FramePipeline
+    from wire_format import CONTENT_TYPE as COMPACT_CONTENT_TYPE, decode_records
+    import rollups
+    import analytics_series
+    from checkin_index import CheckInIndex
+    from events import EventBroker
+    from response_cache import ResponseCache
+    from write_buffer import WriteBehindBuffer
+    import queue
 
     # Get video source from environment variable, default to camera index 0
     video_source = os.environ.get('VIDEO_SOURCE', 'attached_assets/check.MOV')
-    camera = VideoCamera(video_source)
-    processor = ArucoProcessor()
-
-    def gen_frames():
-        while True:
-            frame = camera.get_frame()
-            if frame is not None:
-                processed_frame, _ = processor.process_frame(frame)
-                if processed_frame is not None:
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + processed_frame + b'\r\n')
-            time.sleep(0.1)
+    jpeg_quality = int(os.environ.get('STREAM_JPEG_QUALITY', 80))
+    stream_width = int(os.environ.get('STREAM_WIDTH', 0)) or None
+    latest_frame = os.environ.get('CAPTURE_MODE', 'latest') == 'latest'
+    camera = VideoCamera(video_source, jpeg_quality=jpeg_quality, max_width=stream_width,
+                         latest_frame=latest_frame)
+    processor = ArucoProcessor(jpeg_quality=jpeg_quality, output_width=stream_width,
+                               roi_margin=float(os.environ.get('DETECT_ROI_MARGIN', 0.25)),
+                               detect_scale=float(os.environ.get('DETECT_SCALE', 1.0)))
+
+    # DETECT_MODE=auto answers the kiosk check from the center box alone while
+    # nobody is watching the video feed
+    pipeline = FramePipeline(camera, processor,
+                             center_only_when_unwatched=os.environ.get('DETECT_MODE', 'full') == 'auto')
+    checkin_index = CheckInIndex()
+    broker = EventBroker()
+    # Dashboard/kiosk polling responses, shared across tabs for a few seconds
+    response_cache = ResponseCache(ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 5)))
+
+    def cached_json(key, build):
+        """JSON response for key from the response cache, 304 if the client's ETag matches"""
+        cached = response_cache.get(key, lambda: json.dumps(build()))
+        response = Response(cached.body, mimetype='application/json')
+        response.set_etag(cached.etag)
+        response.headers['Cache-Control'] = 'no-cache'  # Always revalidate with the ETag
+        return response.make_conditional(request)
+
+    def kiosk_status(detected_id):
+        """Check-in status shown on the kiosk for the marker in the center box"""
+        if not detected_id:
+            return {'detected': False, 'aruco_id': None, 'status': None}
+        latest_checkin = checkin_index.get(detected_id)
+        if latest_checkin:
+            if latest_checkin.status == 'checked_in':
+                status = 'can_checkout'
+            elif latest_checkin.can_check_in:
+                status = 'can_checkin'
+            else:
+                status = 'cooldown'
+        else:
+            status = 'can_checkin'
+        return {'detected': True, 'aruco_id': detected_id, 'status': status}
+
+    # Last kiosk status pushed to /events. Written by the pipeline thread and
+    # by check-in requests, so it is replaced and published under a lock.
+    last_kiosk_status = {}
+    kiosk_status_lock = Lock()
+
+    def publish_detection(result):
+        """Pipeline listener: push kiosk status to /events only when it changes"""
+        nonlocal last_kiosk_status
+        with app.app_context():
+            status = kiosk_status(result.in_center_id)
+        with kiosk_status_lock:
+            if status != last_kiosk_status:
+                last_kiosk_status = status
+                broker.publish('detection', status)
+
+    pipeline.add_listener(publish_detection)
 
     @app.route('/')
     def index():
@@ -61,50 +130,34 @@ def create_app():
 
     @app.route('/video_feed')
     def video_feed():
-        return Response(gen_frames(),
+        return Response(pipeline.subscribe(),
                        mimetype='multipart/x-mixed-replace; boundary=frame')
 
     @app.route('/check_aruco')
     def check_aruco():
         try:
-            frame = camera.get_frame(raw=True)
-            if frame is not None:
-                detected_id = processor.check_aruco_in_center(frame)
-                if detected_id:
-                    latest_checkin = CheckIn.get_latest_by_aruco(detected_id)
-                    if latest_checkin:
-                        if latest_checkin.status == 'checked_in':
-                            return jsonify({
-                                'detected': True,
-                                'aruco_id': detected_id,
-                                'status': 'can_checkout'
-                            })
-                        elif latest_checkin.can_check_in:
-                            return jsonify({
-                                'detected': True,
-                                'aruco_id': detected_id,
-                                'status': 'can_checkin'
-                            })
-                        else:
-                            return jsonify({
-                                'detected': True,
-                                'aruco_id': detected_id,
-                                'status': 'cooldown'
-                            })
-                    else:
-                        return jsonify({
-                            'detected': True,
-                            'aruco_id': detected_id,
-                            'status': 'can_checkin'
-                        })
+            return jsonify(kiosk_status(pipeline.latest_detection().in_center_id))
         except Exception as e:
             logging.error(f"Error checking ArUco: {str(e)}")
         return jsonify({'detected': False, 'aruco_id': None, 'status': None})
 
+    @app.route('/events')
+    def events():
+        """
+        Server-Sent Events stream. ?topics= selects a comma separated subset of
+        detection (kiosk status changes), history (check-in history after each
+        check-in/checkout) and analytics (dashboard payload after new observations).
+        """
+        topics = request.args.get('topics', 'detection,history,analytics').split(',')
+        if 'detection' in topics:
+            pipeline.start()
+        return Response(broker.stream(topics), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
     @app.route('/checkin/<aruco_id>')
     def checkin(aruco_id):
         try:
-            latest_checkin = CheckIn.get_latest_by_aruco(aruco_id)
+            latest_checkin = checkin_index.get(aruco_id)
             if latest_checkin and latest_checkin.status == 'checked_in':
                 return jsonify({'success': False, 'error': 'Already checked in'})
 
@@ -114,42 +167,65 @@ def create_app():
             new_checkin = CheckIn(aruco_id=aruco_id)
             db.session.add(new_checkin)
             db.session.commit()
+            checkin_index.record(new_checkin)
+            publish_checkin_change(aruco_id)
             return jsonify({'success': True, 'timestamp': new_checkin.check_in_time.isoformat()})
         except Exception as e:
+            db.session.rollback()
             logging.error(f"Error in checkin: {str(e)}")
             return jsonify({'success': False, 'error': str(e)})
 
     @app.route('/checkout/<aruco_id>')
     def checkout(aruco_id):
         try:
-            checkin = CheckIn.get_latest_by_aruco(aruco_id)
-            if not checkin or checkin.status != 'checked_in':
+            state = checkin_index.get(aruco_id)
+            if not state or state.status != 'checked_in':
                 return jsonify({'success': False, 'error': 'No active check-in found'})
 
+            checkin = db.session.get(CheckIn, state.id)
             checkin.status = 'checked_out'
             checkin.check_out_time = datetime.utcnow()
             db.session.commit()
+            checkin_index.record(checkin)
+            publish_checkin_change(aruco_id)
             return jsonify({'success': True, 'timestamp': checkin.check_out_time.isoformat()})
         except Exception as e:
+            db.session.rollback()
+            checkin_index.invalidate(aruco_id)
             logging.error(f"Error in checkout: {str(e)}")
             return jsonify({'success': False, 'error': str(e)})
 
+    def history_payload():
+        checkins = CheckIn.query.order_by(CheckIn.check_in_time.desc()).limit(10).all()
+        return [{
+            'aruco_id': c.aruco_id,
+            'timestamp': c.check_in_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'status': c.status,
+            'checkout_time': c.check_out_time.strftime('%Y-%m-%d %H:%M:%S') if c.check_out_time else None
+        } for c in checkins]
+
+    def publish_checkin_change(aruco_id):
+        """Push the new history, and the kiosk status if this marker is on screen"""
+        nonlocal last_kiosk_status
+        response_cache.invalidate('history')
+        broker.publish('history', history_payload())
+        if last_kiosk_status.get('aruco_id') != aruco_id:
+            return
+        status = kiosk_status(aruco_id)
+        with kiosk_status_lock:
+            # Skip if the pipeline moved on to another marker meanwhile
+            if last_kiosk_status.get('aruco_id') == aruco_id:
+                last_kiosk_status = status
+                broker.publish('detection', status)
+
     @app.route('/get_history')
     def get_history():
         try:
-            checkins = CheckIn.query.order_by(CheckIn.check_in_time.desc()).limit(10).all()
-            history = [{
-                'aruco_id': c.aruco_id,
-                'timestamp': c.check_in_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'status': c.status,
-                'checkout_time': c.check_out_time.strftime('%Y-%m-%d %H:%M:%S') if c.check_out_time else None
-            } for c in checkins]
-            return jsonify(history)
+            return cached_json('history', history_payload)
         except Exception as e:
             logging.error(f"Error getting history: {str(e)}")
             return jsonify([])
 
-
     @app.route('/api/camera/register', methods=['POST'])
     def register_camera():
         """Register a new camera/RPI in the system"""
@@ -168,103 +244,277 @@ def create_app():
             logging.error(f"Error registering camera: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    def read_reports():
+        """Return the report records in the request body, JSON or compact binary"""
+        if request.mimetype == COMPACT_CONTENT_TYPE:
+            return decode_records(request.get_data())
+        data = request.json
+        return data['records'] if 'records' in data else [data]
+
+    def observations_written(rows_by_model):
+        if rows_by_model.get(ArtworkHeatmap):
+            response_cache.invalidate_prefix('heatmap?')
+        if rows_by_model.get(ArtworkObservation):
+            response_cache.invalidate('analytics')
+            response_cache.invalidate_prefix('series?')
+            broker.publish_later('analytics', publish_analytics)
+
+    def apply_rollups(rows_by_model):
+        """Fold an ingest's rows into the rollup tables, in its transaction"""
+        rollups.apply_observation_rows(rows_by_model.get(ArtworkObservation, []))
+        rollups.apply_heatmaps(rows_by_model.get(ArtworkHeatmap, []))
+
+    # Optional group commit of ingest writes: 'flush' acknowledges after the
+    # group is committed, 'enqueue' as soon as the rows are queued
+    ingest_mode = os.environ.get('INGEST_MODE', 'direct')
+    write_buffer = None
+    if ingest_mode != 'direct':
+        write_buffer = WriteBehindBuffer(
+            app, db,
+            durability=ingest_mode,
+            flush_size=int(os.environ.get('INGEST_FLUSH_SIZE', 500)),
+            flush_interval=float(os.environ.get('INGEST_FLUSH_INTERVAL', 0.05)),
+            before_commit=apply_rollups,
+            merged_models=(ArtworkHeatmap,),
+            on_flush=observations_written
+        )
+
+    def ingest(rows_by_model):
+        """
+        Insert {model: rows} now, or through the write-behind buffer if enabled.
+        ArtworkHeatmap rows are merged into the day's heatmaps, in the same
+        transaction, instead of being inserted.
+        """
+        if write_buffer is not None:
+            future = write_buffer.submit(rows_by_model)
+            if write_buffer.durability == 'flush':
+                future.result(timeout=30)
+            return
+
+        for model, rows in rows_by_model.items():
+            if rows and model is not ArtworkHeatmap:
+                db.session.execute(db.insert(model), rows)
+        apply_rollups(rows_by_model)
+        db.session.commit()
+        observations_written(rows_by_model)
+
     @app.route('/observation/start', methods=['POST']) # Added route for observation start
     def start_observation():
         try:
-            data = request.json
-            event = ObservationEvent(
-                camera_id=data['camera_id'],
-                artwork_id=data['artwork_id'],
-                aruco_id=data['aruco_id'],
-                event_type='start',
-                timestamp=datetime.fromisoformat(data['timestamp'])
-            )
-            db.session.add(event)
-            db.session.commit()
+            ingest({ObservationEvent: [ObservationEvent.row_from_report(read_reports()[0])]})
             return jsonify({'success': True})
+        except queue.Full:
+            return jsonify({'success': False, 'error': 'Ingest queue full'}), 503
         except Exception as e:
+            db.session.rollback()
             return jsonify({'success': False, 'error': str(e)}), 500
 
     @app.route('/observation/update', methods=['POST']) # Modified route for observation update
     def update_observation():
         try:
-            data = request.json
-            observation = ArtworkObservation(
-                camera_id=data['camera_id'],
-                artwork_id=data['artwork_id'],
-                aruco_id=data['aruco_id'],
-                start_time=datetime.fromisoformat(data['timestamp']), #changed to start_time
-                section_1_time=data['section_times'][1],
-                section_2_time=data['section_times'][2],
-                section_3_time=data['section_times'][3],
-                total_time=data['total_time']
-            )
-            db.session.add(observation)
-            db.session.commit()
+            ingest({ArtworkObservation: [ArtworkObservation.row_from_report(read_reports()[0])]})
             return jsonify({'success': True})
+        except queue.Full:
+            return jsonify({'success': False, 'error': 'Ingest queue full'}), 503
         except Exception as e:
+            db.session.rollback()
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/observation/heatmap', methods=['POST'])
+    def heatmap_observation():
+        try:
+            ingest({ArtworkHeatmap: [ArtworkHeatmap.row_from_report(read_reports()[0])]})
+            return jsonify({'success': True})
+        except queue.Full:
+            return jsonify({'success': False, 'error': 'Ingest queue full'}), 503
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/observation/batch', methods=['POST'])
+    def batch_observations():
+        """
+        Ingest many start/update reports, from one or many cameras, in one request.
+        Body: {"records": [{"type": "start" | "update" | "heatmap", ...report fields...}, ...]}
+        or the same records in the compact format (Content-Type
+        application/x-aruco-reports, see wire_format.py).
+        All valid records are written with one set-based insert per table
+        (heatmaps are merged) and a single commit; invalid records are
+        reported by index and skipped.
+        """
+        try:
+            records = read_reports()
+            parsers = {
+                'start': (ObservationEvent, ObservationEvent.row_from_report),
+                'update': (ArtworkObservation, ArtworkObservation.row_from_report),
+                'heatmap': (ArtworkHeatmap, ArtworkHeatmap.row_from_report),
+            }
+            rows = {model: [] for model, _ in parsers.values()}
+            errors = []
+            for index, record in enumerate(records):
+                try:
+                    model, parse = parsers[record.get('type')]
+                    rows[model].append(parse(record))
+                except Exception as e:
+                    errors.append({'index': index, 'error': f"{type(e).__name__}: {str(e)}"})
+
+            ingest(rows)
+            return jsonify({
+                'success': True,
+                'accepted': len(records) - len(errors),
+                'errors': errors
+            })
+        except queue.Full:
+            return jsonify({'success': False, 'error': 'Ingest queue full'}), 503
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error in batch ingest: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    def analytics_payload():
+        # Get active cameras (active in last 5 minutes)
+        active_time = datetime.utcnow() - timedelta(minutes=5)
+        active_cameras = DBCamera.query.filter(DBCamera.last_active >= active_time).count()
+
+        # Today's totals from the rollup tables maintained on ingest
+        today = datetime.utcnow().date()
+        total_visitors = DailyVisitor.query.filter(DailyVisitor.day == today).count()
+
+        today_stats = db.session.query(
+            db.func.sum(ArtworkDailyStats.observation_count),
+            db.func.sum(ArtworkDailyStats.total_time),
+            db.func.sum(ArtworkDailyStats.section_1_time),
+            db.func.sum(ArtworkDailyStats.section_2_time),
+            db.func.sum(ArtworkDailyStats.section_3_time)
+        ).filter(ArtworkDailyStats.day == today).first()
+        observation_count = today_stats[0] or 0
+        average = lambda total: (total or 0) / observation_count if observation_count else 0
+
+        # Get average time spent per artwork (in minutes)
+        avg_time = average(today_stats[1])
+
+        # Get most popular artwork
+        popular_artwork = db.session.query(
+            ArtworkDailyStats.artwork_id,
+            db.func.sum(ArtworkDailyStats.observation_count).label('visit_count')
+        ).group_by(ArtworkDailyStats.artwork_id)\
+        .order_by(db.text('visit_count DESC')).first()
+
+        # Get section time distribution
+        section_times = [average(total) for total in today_stats[2:]]
+
+        # Get recent observations
+        recent = ArtworkObservation.query\
+            .order_by(ArtworkObservation.start_time.desc())\
+            .limit(10)\
+            .all()
+
+        analytics = {
+            'total_visitors': total_visitors or 0,
+            'active_cameras': active_cameras or 0,
+            'avg_time': round(float(avg_time) / 60, 1),  # Convert to minutes
+            'popular_artwork': popular_artwork[0] if popular_artwork else "N/A",
+            'section_times': {
+                'section_1': round(float(section_times[0] or 0) / 60, 1),
+                'section_2': round(float(section_times[1] or 0) / 60, 1),
+                'section_3': round(float(section_times[2] or 0) / 60, 1)
+            },
+            'recent_observations': [{
+                'aruco_id': str(obs.aruco_id),
+                'artwork_id': obs.artwork_id,
+                'time_spent': f"{float(obs.total_time)/60:.1f} min",
+                'sections': ', '.join(str(i) for i, t in obs.section_times.items() if t > 0),
+                'timestamp': obs.start_time.strftime('%Y-%m-%d %H:%M')
+            } for obs in recent] if recent else []
+        }
+        return analytics
+
+    def publish_analytics():
+        """Recompute the dashboard payload once for every connected dashboard"""
+        with app.app_context():
+            return analytics_payload()
+
     @app.route('/api/analytics')
     def get_analytics():
         try:
-            # Get active cameras (active in last 5 minutes)
-            active_time = datetime.utcnow() - timedelta(minutes=5)
-            active_cameras = DBCamera.query.filter(DBCamera.last_active >= active_time).count()
-
-            # Get total unique visitors today
-            today = datetime.utcnow().date()
-            total_visitors = db.session.query(db.func.count(db.distinct(ArtworkObservation.aruco_id)))\
-                .filter(db.func.date(ArtworkObservation.start_time) == today).scalar()
-
-            # Get average time spent per artwork (in minutes)
-            avg_time = db.session.query(db.func.avg(ArtworkObservation.total_time))\
-                .filter(db.func.date(ArtworkObservation.start_time) == today)\
-                .scalar() or 0
-
-            # Get most popular artwork
-            popular_artwork = db.session.query(
-                ArtworkObservation.artwork_id,
-                db.func.count(ArtworkObservation.id).label('visit_count')
-            ).group_by(ArtworkObservation.artwork_id)\
-            .order_by(db.text('visit_count DESC')).first()
-
-            # Get section time distribution
-            section_times = db.session.query(
-                db.func.avg(ArtworkObservation.section_1_time).label('section_1'),
-                db.func.avg(ArtworkObservation.section_2_time).label('section_2'),
-                db.func.avg(ArtworkObservation.section_3_time).label('section_3')
-            ).filter(db.func.date(ArtworkObservation.start_time) == today).first()
-
-            # Get recent observations
-            recent = ArtworkObservation.query\
-                .order_by(ArtworkObservation.start_time.desc())\
-                .limit(10)\
-                .all()
-
-            analytics = {
-                'total_visitors': total_visitors or 0,
-                'active_cameras': active_cameras or 0,
-                'avg_time': round(float(avg_time) / 60, 1),  # Convert to minutes
-                'popular_artwork': popular_artwork[0] if popular_artwork else "N/A",
-                'section_times': {
-                    'section_1': round(float(section_times[0] or 0) / 60, 1),
-                    'section_2': round(float(section_times[1] or 0) / 60, 1),
-                    'section_3': round(float(section_times[2] or 0) / 60, 1)
-                },
-                'recent_observations': [{
-                    'aruco_id': str(obs.aruco_id),
-                    'artwork_id': obs.artwork_id,
-                    'time_spent': f"{float(obs.total_time)/60:.1f} min",
-                    'sections': ', '.join(str(i) for i, t in obs.section_times.items() if t > 0),
-                    'timestamp': obs.start_time.strftime('%Y-%m-%d %H:%M')
-                } for obs in recent] if recent else []
-            }
-            return jsonify(analytics)
+            return cached_json('analytics', analytics_payload)
         except Exception as e:
             logging.error(f"Error fetching analytics: {str(e)}")
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/analytics/series')
+    def get_analytics_series():
+        """
+        Time-bucketed observation series. Query parameters: start/end (ISO,
+        UTC; default the last 24 hours), bucket (minute|hour|day), max_points,
+        group_by (artwork|camera), artwork_id, camera_id.
+        """
+        try:
+            end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow()
+            start = datetime.fromisoformat(request.args['start']) if 'start' in request.args \
+                else end - timedelta(days=1)
+            bucket = request.args.get('bucket', 'hour')
+            group_by = request.args.get('group_by') or None
+            max_points = min(int(request.args.get('max_points', 500)), 2000)
+            if bucket not in analytics_series.BUCKETS or start >= end or max_points < 1 or \
+                    (group_by and group_by not in analytics_series.GROUP_COLUMNS):
+                raise ValueError("Invalid range, bucket or group_by")
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            # Shared by every dashboard asking for the same range until the TTL
+            # passes or new observations arrive
+            key = 'series?' + '&'.join(f'{k}={v}' for k, v in sorted(request.args.items()))
+            return cached_json(key, lambda: analytics_series.series(
+                start, end, bucket, max_points, group_by,
+                request.args.get('artwork_id'), request.args.get('camera_id')))
+        except Exception as e:
+            logging.error(f"Error fetching analytics series: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/heatmap')
+    def get_heatmap():
+        """
+        Day heatmap of an artwork: ?artwork_id=&day=YYYY-MM-DD (default today,
+        UTC). Without artwork_id, lists the artworks with a heatmap that day.
+        """
+        try:
+            day = datetime.strptime(request.args['day'], '%Y-%m-%d').date() if 'day' in request.args \
+                else datetime.utcnow().date()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        artwork_id = request.args.get('artwork_id')
+
+        def build():
+            if not artwork_id:
+                artworks = db.session.query(ArtworkHeatmap.artwork_id)\
+                    .filter(ArtworkHeatmap.day == day)\
+                    .order_by(ArtworkHeatmap.artwork_id).all()
+                return {'day': day.isoformat(), 'artworks': [a[0] for a in artworks]}
+
+            heatmap = db.session.get(ArtworkHeatmap, (day, artwork_id))
+            if heatmap is None:
+                raise LookupError('No heatmap for this artwork and day')
+            cells = heatmap.cells
+            return {
+                'day': day.isoformat(),
+                'artwork_id': artwork_id,
+                'rows': heatmap.rows,
+                'cols': heatmap.cols,
+                'max': round(float(cells.max()), 1),
+                'grid': [[round(float(v), 1) for v in row] for row in cells]
+            }
+
+        try:
+            return cached_json(f'heatmap?day={day.isoformat()}&artwork_id={artwork_id or ""}', build)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+        except Exception as e:
+            logging.error(f"Error fetching heatmap: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/camera_config')
     def camera_config():
         return render_template('camera_config.html')
@@ -288,19 +538,54 @@ def create_app():
             data = request.json
             camera_url = data.get('camera_url')
             regions = data.get('regions', [])
-
-            # Save regions to database
-            # TODO: Implement database storage for regions
+            if not camera_url:
+                return jsonify({'success': False, 'error': 'camera_url is required'}), 400
+            if len(regions) > MAX_SECTIONS:
+                return jsonify({'success': False,
+                                'error': f'At most {MAX_SECTIONS} regions are supported'}), 400
+
+            # Replace the stored regions for this camera
+            Region.query.filter_by(camera_url=camera_url).delete()
+            for section, region in enumerate(regions, start=1):
+                db.session.add(Region(
+                    camera_url=camera_url,
+                    section=section,
+                    name=region.get('name', f'Region {section}'),
+                    points=json.dumps(region['points'])
+                ))
+            db.session.commit()
 
             return jsonify({'success': True})
         except Exception as e:
+            db.session.rollback()
             logging.error(f"Error saving regions: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/api/regions')
+    def get_regions():
+        """Return the saved section polygons for a camera, in section order"""
+        try:
+            camera_url = request.args.get('camera_url')
+            regions = Region.query.filter_by(camera_url=camera_url).order_by(Region.section).all()
+            return jsonify([{
+                'section': r.section,
+                'name': r.name,
+                'points': r.polygon
+            } for r in regions])
+        except Exception as e:
+            logging.error(f"Error getting regions: {str(e)}")
+            return jsonify([]), 500
+
     # Create database tables
     with app.app_context():
         db.create_all()
+        # create_all() only indexes the tables it creates, so indexes added
+        # to existing tables since the database was created are made here
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
         logging.info("Database tables created successfully")
+        rollups.rebuild_if_empty()
 
     return app
 
@@ -2,13 +2,18 @@ import cv2
 import numpy as np
 import logging
 from datetime import datetime
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import json
-import requests
 import os
 from dataclasses import dataclass
 from time import time
 
+from motion_gate import MotionGate
+from reporter import Reporter
+from wire_format import encode_grid
+
+MAX_SECTIONS = 3  # Sections the server stores per observation (section_1..3)
+
 @dataclass
 class ArtworkObservation:
     artwork_id: str  # Location/artwork identifier
@@ -18,27 +23,82 @@ class ArtworkObservation:
     section_times: Dict[int, float]  # Section -> time spent
 
 class ArtworkTracker:
-    def __init__(self, camera_id: str, artwork_id: str, server_url: str):
+    def __init__(self, camera_id: str, artwork_id: str, server_url: str,
+                 tracking: bool = False, full_scan_interval: int = 10,
+                 search_margin: float = 0.75,
+                 regions: Optional[List[List[Tuple[float, float]]]] = None,
+                 reporter: Optional[Reporter] = None,
+                 motion_gate: Optional[MotionGate] = None,
+                 session_timeout: float = 10.0,
+                 heatmap_shape: Tuple[int, int] = (24, 32)):
         """
         Initialize artwork observation tracker
         Args:
             camera_id: Unique identifier for this camera/pi
             artwork_id: Identifier for the artwork being observed
             server_url: URL of the central server
+            tracking: If True, markers seen in the previous frame are searched
+                for only in small predicted windows; the whole frame is scanned
+                every full_scan_interval frames or when a track is lost
+            full_scan_interval: Frames between full-frame scans in tracking mode
+            search_margin: Padding around a predicted marker position, as a
+                fraction of the marker's size
+            regions: Section polygons in normalized (0-1) frame coordinates,
+                as saved from the camera config page. Region i is section i+1.
+                At most MAX_SECTIONS are used. Defaults to three vertical thirds.
+            reporter: Reporter used to deliver reports in the background.
+                Defaults to one without an on-disk spool.
+            motion_gate: If set, while no markers are in view detection only
+                runs on frames where the gate sees a change. Frames with
+                markers in view are always detected.
+            session_timeout: Seconds a marker may be out of view before its
+                session is closed. A closed session sends a final observation
+                with its start and end times and its state is cleared, so the
+                marker starts a new session when it is seen again.
+            heatmap_shape: (rows, cols) of the occupancy grid that accumulates
+                dwell seconds by marker position; uploaded and cleared with
+                every report
         """
         self.camera_id = camera_id
         self.artwork_id = artwork_id
         self.server_url = server_url.rstrip('/')  # Remove trailing slash if present
+        self.reporter = reporter or Reporter(self.server_url)
 
         # Initialize ArUco detector
         self.aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_50)
         self.parameters = cv2.aruco.DetectorParameters()
         self.detector = cv2.aruco.ArucoDetector(self.aruco_dict, self.parameters)
 
-        # Tracking state
-        self.marker_section_times: Dict[int, Dict[int, float]] = {}  # marker_id -> section -> time
-        self.marker_last_times: Dict[int, float] = {}  # marker_id -> last_seen_time
-        self.marker_current_sections: Dict[int, int] = {}  # marker_id -> current_section
+        # Tracking state, indexed by marker id. Section 0 means "outside every
+        # region" and is never reported.
+        if regions and len(regions) > MAX_SECTIONS:
+            logging.warning(f"Only the first {MAX_SECTIONS} of {len(regions)} regions are tracked")
+            regions = regions[:MAX_SECTIONS]
+        self.regions = regions
+        self.num_sections = len(regions) if regions else 3
+        num_markers = self.aruco_dict.bytesList.shape[0]
+        self.section_times = np.zeros((num_markers, self.num_sections + 1))  # marker_id -> section -> time
+        self.last_times = np.full(num_markers, np.nan)  # marker_id -> last_seen_time (nan = never seen)
+        self.current_sections = np.zeros(num_markers, dtype=np.intp)  # marker_id -> current_section
+        self.start_times = np.full(num_markers, np.nan)  # marker_id -> session start (nan = no open session)
+        self.reported_times = np.zeros(num_markers)  # marker_id -> time already sent in this session's updates
+        self.session_timeout = session_timeout
+        self.heatmap = np.zeros(heatmap_shape, dtype=np.float32)  # Dwell seconds per grid cell
+        self._section_mask: Optional[np.ndarray] = None  # Per-pixel section label, built per frame size
+
+        # Markers from the last detection; the motion gate only applies while there are none
+        self.motion_gate = motion_gate
+        self._last_corners: Optional[np.ndarray] = None
+        self._last_ids: Optional[np.ndarray] = None
+        self.skipped_frames = 0
+        self.last_frame_changed = True  # False when the motion gate skipped the last frame
+
+        # Temporal tracking state
+        self.tracking = tracking
+        self.full_scan_interval = max(1, full_scan_interval)
+        self.search_margin = search_margin
+        self._tracks: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}  # marker_id -> (corners, velocity)
+        self._frames_since_scan = 0
 
         # Configure logging
         logging.basicConfig(
@@ -46,52 +106,202 @@ class ArtworkTracker:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
 
-    def process_frame(self, frame: np.ndarray) -> None:
-        """Process a single frame and update observation times"""
+    def process_frame(self, frame: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """
+        Process a single frame and update observation times.
+        Args:
+            frame: BGR image
+            timestamp: Epoch time the frame was captured. Defaults to now;
+                pass the capture time when frames are processed after a delay
+                so dwell is measured on the camera's clock.
+        """
+        current_time = time() if timestamp is None else timestamp
         try:
             height, width = frame.shape[:2]
-            third_width = width // 3
-            
+
+            # Only an empty scene is gated: a marker leaving or turning can be
+            # too small a change to register on the thumbnail
+            self.last_frame_changed = (self.motion_gate is None or self._last_ids is not None or
+                                       self.motion_gate.changed(frame))
+            if not self.last_frame_changed:
+                # Nothing moved and no markers are being tracked
+                self.skipped_frames += 1
+                self._close_sessions(current_time - self.last_times > self.session_timeout)
+                return
+
             # Detect ArUco markers
-            corners, ids, _ = self.detector.detectMarkers(frame)
-            current_time = time()
-            
-            if ids is not None:
-                for idx, corners in enumerate(corners):
-                    marker_id = int(ids[idx])
-                    
-                    # Calculate marker position
-                    marker_center = np.mean(corners[0], axis=0)
-                    center_x = int(marker_center[0])
-                    
-                    # Determine section (1, 2, or 3)
-                    if center_x < third_width:
-                        new_section = 1
-                    elif center_x < 2 * third_width:
-                        new_section = 2
-                    else:
-                        new_section = 3
-                    
-                    # Initialize tracking for new markers
-                    if marker_id not in self.marker_last_times:
-                        self.marker_last_times[marker_id] = current_time
-                        self.marker_current_sections[marker_id] = new_section
-                        self.marker_section_times[marker_id] = {1: 0, 2: 0, 3: 0}
-                        self._report_observation_start(marker_id)
-                        continue
-                    
-                    # Update time for current section
-                    if self.marker_current_sections[marker_id] == new_section:
-                        elapsed = current_time - self.marker_last_times[marker_id]
-                        self.marker_section_times[marker_id][new_section] += elapsed
-                    
-                    self.marker_current_sections[marker_id] = new_section
-                    self.marker_last_times[marker_id] = current_time
+            corners, ids = self._detect(frame) if self.tracking else self.detector.detectMarkers(frame)[:2]
+
+            if ids is not None and len(corners) > 0:
+                self._last_corners = np.concatenate(corners).reshape(-1, 4, 2)
+                self._last_ids = ids.flatten()
+                self._update_sections(self._last_corners, self._last_ids, width, height, current_time)
+            else:
+                self._last_corners = self._last_ids = None
+
+            self._close_sessions(current_time - self.last_times > self.session_timeout)
 
         except Exception as e:
             logging.error(f"Error processing frame: {str(e)}")
 
-    def _report_observation_start(self, marker_id: int) -> None:
+    def _update_sections(self, corners: np.ndarray, ids: np.ndarray, width: int, height: int,
+                         current_time: float) -> None:
+        """Vectorized section accounting for all markers detected in one frame"""
+        ids = ids.astype(np.intp)
+        mask = self.section_mask(width, height)
+
+        # Marker centers and the section each one falls in
+        centers = corners.mean(axis=1)
+        xs = np.clip(centers[:, 0].astype(np.intp), 0, width - 1)
+        ys = np.clip(centers[:, 1].astype(np.intp), 0, height - 1)
+        new_sections = mask[ys, xs]
+
+        # Dwell by position for the heatmap, credited to the cell each marker is in now
+        known = ~np.isnan(self.last_times[ids])
+        rows, cols = self.heatmap.shape
+        np.add.at(self.heatmap, (ys[known] * rows // height, xs[known] * cols // width),
+                  current_time - self.last_times[ids[known]])
+
+        # Add the elapsed time for markers that stayed in the same section
+        stayed = known & (self.current_sections[ids] == new_sections)
+        np.add.at(self.section_times, (ids[stayed], new_sections[stayed]),
+                  current_time - self.last_times[ids[stayed]])
+
+        self.current_sections[ids] = new_sections
+        self.last_times[ids] = current_time
+
+        # Open a session for markers without one
+        for marker_id in np.unique(ids[~known]):
+            self.section_times[marker_id] = 0
+            self.start_times[marker_id] = current_time
+            self._report_observation_start(int(marker_id), current_time)
+
+    def _close_sessions(self, expired: np.ndarray) -> None:
+        """
+        Send the final observation of every session selected by the boolean
+        mask expired and clear its state.
+
+        Like every update, the final one carries only the time not yet
+        reported; its start_time/end_time span the whole session, whose
+        dwell is the sum of its updates. Sessions that never accumulated any
+        time (e.g. a one-frame false detection) send nothing. A final update
+        with no remaining time still marks the end of a session that did.
+        """
+        for marker_id in np.flatnonzero(expired):
+            if self.section_times[marker_id, 1:].sum() + self.reported_times[marker_id] <= 0:
+                continue
+            data = self._observation(marker_id, self.last_times[marker_id])
+            data['start_time'] = datetime.utcfromtimestamp(self.start_times[marker_id]).isoformat()
+            data['end_time'] = data['timestamp']
+            try:
+                self.reporter.submit('/observation/update', data)
+            except Exception as e:
+                logging.error(f"Failed to report observation end: {str(e)}")
+
+        self.section_times[expired] = 0
+        self.reported_times[expired] = 0
+        self.last_times[expired] = np.nan
+        self.start_times[expired] = np.nan
+        self.current_sections[expired] = 0
+
+    def section_mask(self, width: int, height: int) -> np.ndarray:
+        """Return the per-pixel section label mask for the given frame size"""
+        if self._section_mask is not None and self._section_mask.shape == (height, width):
+            return self._section_mask
+
+        if self.regions:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            scale = np.array([width, height], dtype=np.float64)
+            for section, polygon in enumerate(self.regions, start=1):
+                points = np.round(np.asarray(polygon, dtype=np.float64) * scale).astype(np.int32)
+                cv2.fillPoly(mask, [points], section)
+        else:
+            # Three vertical thirds
+            third_width = width // 3
+            columns = np.minimum(np.arange(width) // max(third_width, 1), 2) + 1
+            mask = np.broadcast_to(columns.astype(np.uint8), (height, width))
+
+        self._section_mask = mask
+        return mask
+
+    @property
+    def is_active(self) -> bool:
+        """True if markers were visible or the scene changed in the last frame"""
+        return self._last_ids is not None or self.last_frame_changed
+
+    @property
+    def marker_section_times(self) -> Dict[int, Dict[int, float]]:
+        """Unreported section times of every open session, as marker_id -> section -> time"""
+        return {int(marker_id): {section: float(self.section_times[marker_id, section])
+                                 for section in range(1, self.num_sections + 1)}
+                for marker_id in np.flatnonzero(~np.isnan(self.last_times))}
+
+    @property
+    def marker_last_times(self) -> Dict[int, float]:
+        return {int(marker_id): float(self.last_times[marker_id])
+                for marker_id in np.flatnonzero(~np.isnan(self.last_times))}
+
+    def _detect(self, frame: np.ndarray) -> Tuple[list, Optional[np.ndarray]]:
+        """
+        Detect markers using predicted search windows around known tracks,
+        falling back to a full-frame scan periodically or when a track is lost.
+        Returns:
+            (corners, ids) in the same layout as detectMarkers
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        self._frames_since_scan += 1
+
+        found: Dict[int, np.ndarray] = {}
+        if self._tracks and self._frames_since_scan < self.full_scan_interval:
+            found = self._detect_in_windows(gray)
+            if any(marker_id not in found for marker_id in self._tracks):
+                found = {}  # A track was lost, rescan the whole frame
+
+        if not found:
+            corners, ids, _ = self.detector.detectMarkers(gray)
+            self._frames_since_scan = 0
+            if ids is not None:
+                found = {int(marker_id): c.reshape(4, 2) for marker_id, c in zip(ids.flatten(), corners)}
+
+        # Update tracks with a constant velocity model
+        tracks = {}
+        for marker_id, marker_corners in found.items():
+            previous = self._tracks.get(marker_id)
+            velocity = marker_corners - previous[0] if previous is not None else np.zeros_like(marker_corners)
+            tracks[marker_id] = (marker_corners, velocity)
+        self._tracks = tracks
+
+        if not found:
+            return [], None
+        marker_ids = list(found)
+        return ([found[m].reshape(1, 4, 2) for m in marker_ids],
+                np.array(marker_ids, dtype=np.int32).reshape(-1, 1))
+
+    def _detect_in_windows(self, gray: np.ndarray) -> Dict[int, np.ndarray]:
+        """Search each track's predicted window and return marker_id -> corners"""
+        height, width = gray.shape[:2]
+        found: Dict[int, np.ndarray] = {}
+        for marker_id, (marker_corners, velocity) in self._tracks.items():
+            if marker_id in found:
+                continue
+            predicted = marker_corners + velocity
+            x_min, y_min = predicted.min(axis=0)
+            x_max, y_max = predicted.max(axis=0)
+            pad = max(x_max - x_min, y_max - y_min) * self.search_margin + 8
+            x0, y0 = max(int(x_min - pad), 0), max(int(y_min - pad), 0)
+            x1, y1 = min(int(x_max + pad) + 1, width), min(int(y_max + pad) + 1, height)
+            if x1 - x0 < 8 or y1 - y0 < 8:
+                continue
+
+            corners, ids, _ = self.detector.detectMarkers(gray[y0:y1, x0:x1])
+            if ids is None:
+                continue
+            offset = np.array([x0, y0], dtype=np.float32)
+            for window_id, window_corners in zip(ids.flatten(), corners):
+                found.setdefault(int(window_id), window_corners.reshape(4, 2) + offset)
+        return found
+
+    def _report_observation_start(self, marker_id: int, start_time: float) -> None:
         """Report the start of a new observation"""
         try:
             data = {
@@ -99,36 +309,62 @@ class ArtworkTracker:
                 'artwork_id': self.artwork_id,
                 'aruco_id': marker_id,
                 'event_type': 'start',
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': datetime.utcfromtimestamp(start_time).isoformat()
             }
-            response = requests.post(f"{self.server_url}/observation/start", json=data)
-            if not response.ok:
-                logging.error(f"Failed to report observation start: {response.text}")
+            self.reporter.submit('/observation/start', data)
         except Exception as e:
             logging.error(f"Failed to report observation start: {str(e)}")
 
+    def _observation(self, marker_id: int, timestamp: float) -> dict:
+        """Build an /observation/update report of a marker's unreported section times"""
+        section_times = {section: float(self.section_times[marker_id, section])
+                         for section in range(1, self.num_sections + 1)}
+        return {
+            'camera_id': self.camera_id,
+            'artwork_id': self.artwork_id,
+            'aruco_id': int(marker_id),
+            'section_times': section_times,
+            'total_time': sum(section_times.values()),
+            'timestamp': datetime.utcfromtimestamp(timestamp).isoformat()
+        }
+
     def report_section_times(self) -> None:
-        """Report accumulated section times to the server"""
+        """Queue accumulated section times for delivery to the server"""
         current_time = time()
         try:
-            for marker_id, section_times in self.marker_section_times.items():
-                # Only report if we have actual time spent
-                if sum(section_times.values()) > 0:
-                    data = {
-                        'camera_id': self.camera_id,
-                        'artwork_id': self.artwork_id,
-                        'aruco_id': marker_id,
-                        'section_times': section_times,
-                        'total_time': sum(section_times.values()),
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
-
-                    response = requests.post(f"{self.server_url}/observation/update", json=data)
-                    if not response.ok:
-                        logging.error(f"Failed to report section times: {response.text}")
-                    else:
-                        # Reset times after successful reporting
-                        self.marker_section_times[marker_id] = {1: 0, 2: 0, 3: 0}
+            totals = self.section_times[:, 1:].sum(axis=1)
+            # Only report if we have actual time spent
+            for marker_id in np.flatnonzero(totals > 0):
+                self.reporter.submit('/observation/update', self._observation(marker_id, current_time))
+
+                # Reset times once handed to the reporter, which spools them until delivered
+                self.reported_times[marker_id] += totals[marker_id]
+                self.section_times[marker_id] = 0
 
         except Exception as e:
-            logging.error(f"Failed to report section times: {str(e)}")
\ No newline at end of file
+            logging.error(f"Failed to report section times: {str(e)}")
+        self._report_heatmap(current_time)
+
+    def _report_heatmap(self, timestamp: float) -> None:
+        """Queue the occupancy grid accumulated since the last report, then clear it"""
+        if not self.heatmap.any():
+            return
+        try:
+            rows, cols = self.heatmap.shape
+            self.reporter.submit('/observation/heatmap', {
+                'camera_id': self.camera_id,
+                'artwork_id': self.artwork_id,
+                'timestamp': datetime.utcfromtimestamp(timestamp).isoformat(),
+                'rows': rows,
+                'cols': cols,
+                'grid': encode_grid(self.heatmap)
+            })
+            self.heatmap.fill(0)
+        except Exception as e:
+            logging.error(f"Failed to report heatmap: {str(e)}")
+
+    def close(self) -> None:
+        """End every open session, flush pending reports and stop the background reporter"""
+        self._close_sessions(~np.isnan(self.start_times))
+        self._report_heatmap(time())
+        self.reporter.close()
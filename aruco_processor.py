@@ -1,41 +1,75 @@
 import cv2
 import numpy as np
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from camera import encode_jpeg
+
+@dataclass
+class DetectionResult:
+    ids: List[int] = field(default_factory=list)  # All marker ids found in the frame
+    centers: List[Tuple[float, float]] = field(default_factory=list)  # Pixel center per id
+    in_center_id: Optional[str] = None  # Id of the first marker inside the center box
+    timestamp: float = 0.0  # Time the frame was captured/processed
+    version: int = 0  # Incremented by the publisher for every new result
 
 class ArucoProcessor:
-    def __init__(self):
+    def __init__(self, jpeg_quality=95, output_width=None, roi_margin=0.25, detect_scale=1.0):
+        """
+        Args:
+            jpeg_quality: JPEG quality of the annotated output frames
+            output_width: Downscale annotated output wider than this. Detection
+                always runs on the full resolution frame.
+            roi_margin: Extra border around the center box searched by
+                check_aruco_in_center, as a fraction of the box size. Markers
+                whose center is inside the box but whose corners stick out
+                still have to be fully visible to the detector.
+            detect_scale: Scale factor (<= 1.0) applied to the grayscale ROI
+                before detection in check_aruco_in_center. Corners are refined
+                back at full resolution.
+        """
+        self.jpeg_quality = jpeg_quality
+        self.output_width = output_width
+        self.roi_margin = roi_margin
+        self.detect_scale = detect_scale
         self.aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_50)
         self.parameters = cv2.aruco.DetectorParameters()
         self.detector = cv2.aruco.ArucoDetector(self.aruco_dict, self.parameters)
 
     def process_frame(self, frame):
-        # Convert bytes to numpy array
+        jpeg, result = self.annotate_frame(frame)
+        return jpeg, result.in_center_id
+
+    def annotate_frame(self, frame, timestamp=0.0):
+        """
+        Detect markers, draw the center box overlay and encode the frame.
+        Returns:
+            (JPEG bytes, DetectionResult)
+        """
+        # Convert bytes to numpy array. Prefer passing raw frames
+        # (Camera.get_frame(raw=True)) to avoid a lossy decode/encode round trip.
         if isinstance(frame, bytes):
             np_arr = np.frombuffer(frame, np.uint8)
             frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
 
+        # Detect ArUco markers
+        height, width = frame.shape[:2]
+        corners, ids, _ = self.detector.detectMarkers(frame)
+        result = self._build_result(corners, ids, width, height, timestamp)
+
+        self.draw_overlay(frame, corners, ids, result)
+        return encode_jpeg(frame, self.jpeg_quality, self.output_width), result
+
+    def draw_overlay(self, frame, corners, ids, result):
+        """Draw the center box and detected markers onto frame in place"""
         # Draw center box
         height, width = frame.shape[:2]
         box_size = min(width, height) // 2  # Increased box size to half of min dimension
         center_x = width // 2
         center_y = height // 2
 
-        # Detect ArUco markers
-        corners, ids, _ = self.detector.detectMarkers(frame)
-
-        # Check if marker is in center box
-        aruco_detected = False
-        detected_id = None
-        if len(corners) > 0:
-            for i, corner in enumerate(corners):
-                marker_center = np.mean(corner[0], axis=0)
-                if (abs(marker_center[0] - center_x) < box_size//2 and
-                    abs(marker_center[1] - center_y) < box_size//2):
-                    aruco_detected = True
-                    detected_id = str(ids[i][0])  # Convert ID to string
-                    break
-
         # Draw box with color based on detection
-        color = (0, 255, 0) if aruco_detected else (0, 0, 255)  # Green if detected, red if not
+        color = (0, 255, 0) if result.in_center_id else (0, 0, 255)  # Green if detected, red if not
         cv2.rectangle(frame,
                      (center_x - box_size//2, center_y - box_size//2),
                      (center_x + box_size//2, center_y + box_size//2),
@@ -44,22 +78,96 @@ class ArucoProcessor:
         if len(corners) > 0:
             cv2.aruco.drawDetectedMarkers(frame, corners, ids)
 
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        return jpeg.tobytes(), detected_id
-
-    def check_aruco_in_center(self, frame):
-        height, width = frame.shape[:2]
+    def _build_result(self, corners, ids, width, height, timestamp):
         box_size = min(width, height) // 2  # Match the larger box size
         center_x = width // 2
         center_y = height // 2
 
-        # Detect ArUco markers
+        result = DetectionResult(timestamp=timestamp)
+        for i, corner in enumerate(corners):
+            marker_center = np.mean(corner[0], axis=0)
+            result.ids.append(int(ids[i][0]))
+            result.centers.append((float(marker_center[0]), float(marker_center[1])))
+            if (result.in_center_id is None and
+                abs(marker_center[0] - center_x) < box_size//2 and
+                abs(marker_center[1] - center_y) < box_size//2):
+                result.in_center_id = str(ids[i][0])  # Convert ID to string
+        return result
+
+    def check_aruco_in_center(self, frame, roi=True):
+        """
+        Return the id of the first marker inside the center box, or None.
+        Args:
+            frame: BGR frame
+            roi: If True, only the center box (plus roi_margin) is searched,
+                optionally downscaled by detect_scale. If False, the whole
+                frame is searched like process_frame does.
+        """
+        height, width = frame.shape[:2]
+
+        if roi:
+            corners, ids = self.detect_center_roi(frame)
+        else:
+            corners, ids, _ = self.detector.detectMarkers(frame)
+        return self._build_result(corners, ids, width, height, 0.0).in_center_id
+
+    def detect(self, frame, timestamp=0.0):
+        """
+        Full-frame detection without drawing the overlay or encoding a frame.
+        Returns:
+            DetectionResult
+        """
+        height, width = frame.shape[:2]
         corners, ids, _ = self.detector.detectMarkers(frame)
+        return self._build_result(corners, ids, width, height, timestamp)
 
-        if len(corners) > 0:
-            for i, corner in enumerate(corners):
-                marker_center = np.mean(corner[0], axis=0)
-                if (abs(marker_center[0] - center_x) < box_size//2 and
-                    abs(marker_center[1] - center_y) < box_size//2):
-                    return str(ids[i][0])  # Return actual ArUco ID as string
-        return None
\ No newline at end of file
+    def detect_center(self, frame, timestamp=0.0):
+        """
+        Kiosk check without an annotated frame: search only the center box
+        (see detect_center_roi). The result lists only markers near the center.
+        Returns:
+            DetectionResult
+        """
+        height, width = frame.shape[:2]
+        corners, ids = self.detect_center_roi(frame)
+        return self._build_result(corners, ids, width, height, timestamp)
+
+    def center_roi(self, width, height):
+        """Return the (x0, y0, x1, y1) search window around the center box"""
+        box_size = min(width, height) // 2
+        half = box_size // 2 + int(box_size * self.roi_margin)
+        center_x = width // 2
+        center_y = height // 2
+        return (max(center_x - half, 0), max(center_y - half, 0),
+                min(center_x + half, width), min(center_y + half, height))
+
+    def detect_center_roi(self, frame):
+        """
+        Detect markers in the center search window only.
+        Returns:
+            (corners, ids) in full frame coordinates, like detectMarkers
+        """
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = self.center_roi(width, height)
+        roi = frame[y0:y1, x0:x1]
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+
+        scale = self.detect_scale
+        if scale < 1.0:
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            corners, ids, _ = self.detector.detectMarkers(small)
+        else:
+            corners, ids, _ = self.detector.detectMarkers(gray)
+
+        if ids is None or len(corners) == 0:
+            return (), None
+
+        if scale < 1.0:
+            # Map back to ROI resolution and refine against the full resolution pixels
+            points = (np.concatenate(corners).reshape(-1, 1, 2) / scale).astype(np.float32)
+            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+            cv2.cornerSubPix(gray, points, (5, 5), (-1, -1), criteria)
+            corners = list(points.reshape(-1, 1, 4, 2))
+
+        offset = np.array([x0, y0], dtype=np.float32)
+        return tuple(c + offset for c in corners), ids
@@ -0,0 +1,203 @@
+"""
+Offline backfill of observations from recorded footage.
+
+Splits a recording into frame ranges, runs ArtworkTracker over them in a
+process pool with the video's own timestamps as the clock, stitches marker
+sessions that cross chunk boundaries back together and loads the result
+through /observation/batch (or writes it to a JSON file).
+
+    python backfill.py recording.mp4 --camera-id pi_001 --artwork-id artwork_001 \\
+        --start 2024-05-01T09:00:00 --server http://localhost:5000
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import cv2
+import requests
+
+from artwork_tracker import ArtworkTracker
+from wire_format import CONTENT_TYPE as COMPACT_CONTENT_TYPE, encode_records, to_epoch
+
+class SessionCollector:
+    """Stands in for Reporter and keeps the final observation of every session"""
+
+    def __init__(self):
+        self.sessions = []
+
+    def submit(self, path, payload):
+        if path == '/observation/update' and 'end_time' in payload:
+            self.sessions.append({
+                'aruco_id': payload['aruco_id'],
+                'start': to_epoch(payload['start_time']),
+                'end': to_epoch(payload['end_time']),
+                'section_times': {int(k): v for k, v in payload['section_times'].items()},
+            })
+
+    def close(self, timeout=None):
+        pass
+
+def probe(path):
+    """Return (frame count, fps) of a recording"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open {path}")
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        cap.release()
+
+def frame_ranges(frame_count, chunk_frames):
+    """
+    Split [0, frame_count) into chunks that share their boundary frame, so
+    the interval between the last frame of one chunk and the first of the
+    next is counted exactly once
+    """
+    ranges = []
+    first = 0
+    while first < frame_count - 1:
+        last = min(first + chunk_frames, frame_count - 1)
+        ranges.append((first, last))
+        first = last
+    return ranges
+
+def process_chunk(path, first, last, start_epoch, regions, session_timeout, tracking):
+    """
+    Track frames first..last (inclusive) of a recording.
+    Returns:
+        List of sessions ({'aruco_id', 'start', 'end', 'section_times'}),
+        with times in epoch seconds
+    """
+    cv2.setNumThreads(1)  # One decoder/detector thread per worker process
+    collector = SessionCollector()
+    tracker = ArtworkTracker('backfill', 'backfill', '', tracking=tracking, regions=regions,
+                             reporter=collector, session_timeout=session_timeout)
+
+    cap = cv2.VideoCapture(path)
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+        for _ in range(first, last + 1):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Timestamp of the frame just read, on the recording's clock
+            tracker.process_frame(frame, start_epoch + cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+    finally:
+        cap.release()
+        tracker.close()  # Ends sessions still open at the chunk boundary
+    return collector.sessions
+
+def stitch(sessions, session_timeout):
+    """
+    Merge sessions of the same marker separated by no more than
+    session_timeout, which is what a single pass over the recording would
+    have produced across a chunk boundary
+    """
+    merged = []
+    open_sessions = {}
+    for session in sorted(sessions, key=lambda s: s['start']):
+        current = open_sessions.get(session['aruco_id'])
+        if current is not None and session['start'] - current['end'] <= session_timeout:
+            current['end'] = max(current['end'], session['end'])
+            for section, seconds in session['section_times'].items():
+                current['section_times'][section] = current['section_times'].get(section, 0.0) + seconds
+        else:
+            current = dict(session, section_times=dict(session['section_times']))
+            open_sessions[session['aruco_id']] = current
+            merged.append(current)
+    return merged
+
+def to_records(sessions, camera_id, artwork_id):
+    """Turn stitched sessions into /observation/batch start and update records"""
+    iso = lambda epoch: datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+    records = []
+    for session in sessions:
+        base = {'camera_id': camera_id, 'artwork_id': artwork_id, 'aruco_id': session['aruco_id']}
+        records.append(dict(base, type='start', timestamp=iso(session['start'])))
+        records.append(dict(base, type='update', timestamp=iso(session['end']),
+                            start_time=iso(session['start']), end_time=iso(session['end']),
+                            section_times=session['section_times'],
+                            total_time=sum(session['section_times'].values())))
+    return records
+
+def upload(records, server_url, batch_size=500, compact=False):
+    """Bulk-load records through /observation/batch"""
+    session = requests.Session()
+    url = f"{server_url.rstrip('/')}/observation/batch"
+    for offset in range(0, len(records), batch_size):
+        batch = records[offset:offset + batch_size]
+        if compact:
+            response = session.post(url, data=encode_records(batch), timeout=60,
+                                    headers={'Content-Type': COMPACT_CONTENT_TYPE})
+        else:
+            response = session.post(url, json={'records': batch}, timeout=60)
+        response.raise_for_status()
+        for error in response.json().get('errors', []):
+            logging.error(f"Record rejected by server: {error['error']}")
+
+def backfill(path, start_epoch, regions=None, session_timeout=10.0, tracking=True,
+             chunk_seconds=60.0, workers=None):
+    """Process a recording in parallel and return its stitched sessions"""
+    frame_count, fps = probe(path)
+    ranges = frame_ranges(frame_count, max(1, int(chunk_seconds * fps)))
+    logging.info(f"{path}: {frame_count} frames at {fps:.1f} fps in {len(ranges)} chunks")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_chunk, path, first, last, start_epoch, regions,
+                               session_timeout, tracking)
+                   for first, last in ranges]
+        sessions = [session for future in futures for session in future.result()]
+    return stitch(sessions, session_timeout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill observations from a recorded video")
+    parser.add_argument('video')
+    parser.add_argument('--camera-id', required=True)
+    parser.add_argument('--artwork-id', required=True)
+    parser.add_argument('--start', help="Wall-clock time (UTC, ISO 8601) of the first frame "
+                                        "(default: file modification time minus its duration)")
+    parser.add_argument('--regions', help="JSON file of section polygons in normalized coordinates, "
+                                          "as returned by /api/regions (default: three thirds)")
+    parser.add_argument('--session-timeout', type=float, default=10.0)
+    parser.add_argument('--no-tracking', action='store_true', help="Full-frame detection on every frame")
+    parser.add_argument('--chunk-seconds', type=float, default=60.0)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--server', help="Load the observations through this server's /observation/batch")
+    parser.add_argument('--compact', action='store_true', help="Upload in the compact binary format")
+    parser.add_argument('--output', help="Write the records as JSON here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.start:
+        start_epoch = to_epoch(args.start)
+    else:
+        frame_count, fps = probe(args.video)
+        start_epoch = os.path.getmtime(args.video) - frame_count / fps
+
+    regions = None
+    if args.regions:
+        with open(args.regions) as f:
+            regions = [r['points'] if isinstance(r, dict) else r for r in json.load(f)] or None
+
+    started = time.perf_counter()
+    sessions = backfill(args.video, start_epoch, regions, args.session_timeout, not args.no_tracking,
+                        args.chunk_seconds, args.workers)
+    records = to_records(sessions, args.camera_id, args.artwork_id)
+    logging.info(f"{len(sessions)} sessions in {time.perf_counter() - started:.1f} s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'records': records}, f, indent=2)
+    if args.server:
+        upload(records, args.server, compact=args.compact)
+        logging.info(f"Loaded {len(records)} records into {args.server}")
+    if not args.output and not args.server:
+        print(json.dumps({'records': records}, indent=2))
+
+if __name__ == "__main__":
+    main()
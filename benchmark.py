@@ -0,0 +1,341 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from artwork_tracker import ArtworkTracker
+from aruco_processor import ArucoProcessor
+from camera import encode_jpeg
+
+RESOLUTIONS = {
+    '480p': (640, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+class NullReporter:
+    """Reporter stand-in that discards reports, so the tracker benchmarks time only the frame path"""
+
+    def submit(self, path, payload):
+        pass
+
+    def close(self, timeout=None):
+        pass
+
+def render_synthetic_frame(width, height, marker_ids, marker_size=120, seed=0):
+    """
+    Render a grey frame with DICT_6X6_50 markers spread across it.
+    Returns:
+        BGR frame
+    """
+    rng = np.random.default_rng(seed)
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_50)
+    frame = np.full((height, width, 3), 200, dtype=np.uint8)
+    for marker_id in marker_ids:
+        marker = cv2.aruco.generateImageMarker(aruco_dict, int(marker_id), marker_size)
+        # White quiet zone around the marker so it can be detected
+        tile = cv2.copyMakeBorder(marker, 20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+        size = tile.shape[0]
+        x = int(rng.integers(0, width - size))
+        y = int(rng.integers(0, height - size))
+        frame[y:y + size, x:x + size] = cv2.cvtColor(tile, cv2.COLOR_GRAY2BGR)
+    return frame
+
+def render_moving_frames(width, height, num_markers, num_frames, marker_size=120,
+                         speed=4.0, seed=0, noise=0.0, blur=0):
+    """
+    Render a sequence of frames with markers drifting across a grey
+    background, bouncing off the edges.
+    Args:
+        noise: Standard deviation of gaussian pixel noise added to each frame
+        blur: Gaussian blur kernel size (odd, 0 disables)
+    Returns:
+        (frames, truths): BGR frames, and per frame a dict of marker_id -> center
+    """
+    rng = np.random.default_rng(seed)
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_50)
+    tiles = []
+    for marker_id in range(num_markers):
+        marker = cv2.aruco.generateImageMarker(aruco_dict, marker_id, marker_size)
+        tile = cv2.copyMakeBorder(marker, 20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+        tiles.append(cv2.cvtColor(tile, cv2.COLOR_GRAY2BGR))
+    size = tiles[0].shape[0]
+
+    positions = rng.uniform([0, 0], [width - size, height - size], size=(num_markers, 2))
+    velocities = rng.uniform(-speed, speed, size=(num_markers, 2))
+    background = np.full((height, width, 3), 200, dtype=np.uint8)
+
+    frames, truths = [], []
+    for _ in range(num_frames):
+        frame = background.copy()
+        for tile, (x, y) in zip(tiles, positions.astype(int)):
+            frame[y:y + size, x:x + size] = tile
+        if blur:
+            frame = cv2.GaussianBlur(frame, (blur, blur), 0)
+        if noise:
+            frame = np.clip(frame + rng.normal(0, noise, frame.shape), 0, 255).astype(np.uint8)
+        frames.append(frame)
+        truths.append({marker_id: (x + size / 2, y + size / 2)
+                       for marker_id, (x, y) in enumerate(positions.astype(int))})
+
+        positions += velocities
+        bounce = (positions < 0) | (positions > [width - size, height - size])
+        velocities[bounce] *= -1
+        positions = np.clip(positions, 0, [width - size, height - size])
+    return frames, truths
+
+def _time_per_frame(func, frames):
+    """Return (wall ms, cpu ms) per call of func over frames"""
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for frame in frames:
+        func(frame)
+    count = len(frames)
+    return ((time.perf_counter() - wall_start) * 1000 / count,
+            (time.process_time() - cpu_start) * 1000 / count)
+
+def bench_stream_encode(resolution, iterations, jpeg_quality, output_width):
+    """
+    Compare the legacy stream path (encode in Camera.get_frame, decode, detect,
+    encode again in ArucoProcessor.process_frame) against the raw-frame path
+    that encodes once at the end.
+    """
+    width, height = RESOLUTIONS[resolution]
+    base = render_synthetic_frame(width, height, range(4))
+    processor = ArucoProcessor(jpeg_quality=jpeg_quality, output_width=output_width)
+
+    def legacy(frame):
+        processor.process_frame(encode_jpeg(frame, 95))
+
+    def raw(frame):
+        processor.process_frame(frame)
+
+    # process_frame draws on the frame, so each call gets its own copy
+    frames = [base.copy() for _ in range(iterations)]
+    legacy_wall, legacy_cpu = _time_per_frame(legacy, frames)
+    frames = [base.copy() for _ in range(iterations)]
+    raw_wall, raw_cpu = _time_per_frame(raw, frames)
+
+    print(f"stream encode @ {resolution} ({iterations} frames, quality={jpeg_quality}, "
+          f"output_width={output_width or 'full'})")
+    print(f"  encode/decode round trip: {legacy_wall:7.2f} ms wall  {legacy_cpu:7.2f} ms cpu")
+    print(f"  raw frame, single encode: {raw_wall:7.2f} ms wall  {raw_cpu:7.2f} ms cpu")
+    print(f"  cpu saved per frame:      {legacy_cpu - raw_cpu:7.2f} ms")
+
+def bench_center_detection(resolution, iterations, detect_scale):
+    """
+    Compare full-frame detection with the center-ROI (and optionally
+    downscaled) detection used by check_aruco_in_center, and verify that
+    both report the same marker id.
+    """
+    width, height = RESOLUTIONS[resolution]
+    frame = render_synthetic_frame(width, height, range(1, 6), seed=1)
+    # Put a known marker in the middle of the center box
+    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_50)
+    tile = cv2.copyMakeBorder(cv2.aruco.generateImageMarker(aruco_dict, 0, 160),
+                              20, 20, 20, 20, cv2.BORDER_CONSTANT, value=255)
+    size = tile.shape[0]
+    y, x = (height - size) // 2, (width - size) // 2
+    frame[y:y + size, x:x + size] = cv2.cvtColor(tile, cv2.COLOR_GRAY2BGR)
+
+    full = ArucoProcessor()
+    roi = ArucoProcessor(detect_scale=detect_scale)
+    frames = [frame] * iterations
+
+    full_wall, full_cpu = _time_per_frame(lambda f: full.check_aruco_in_center(f, roi=False), frames)
+    roi_wall, roi_cpu = _time_per_frame(lambda f: roi.check_aruco_in_center(f), frames)
+    full_id = full.check_aruco_in_center(frame, roi=False)
+    roi_id = roi.check_aruco_in_center(frame)
+
+    print(f"center detection @ {resolution} ({iterations} frames, detect_scale={detect_scale})")
+    print(f"  full frame:  {full_wall:7.2f} ms wall  {full_cpu:7.2f} ms cpu  id={full_id}")
+    print(f"  center ROI:  {roi_wall:7.2f} ms wall  {roi_cpu:7.2f} ms cpu  id={roi_id}")
+    print(f"  speedup:     {full_wall / roi_wall:7.2f}x  ids match: {full_id == roi_id}")
+
+def bench_tracking(resolution, iterations, num_markers, full_scan_interval):
+    """
+    Compare ArtworkTracker's per-frame full scan with temporal tracking
+    (predicted search windows plus periodic full scans).
+    """
+    width, height = RESOLUTIONS[resolution]
+    frames, _ = render_moving_frames(width, height, num_markers, iterations)
+
+    results = {}
+    for name, tracking in (('full scan', False), ('tracking', True)):
+        tracker = ArtworkTracker('bench', 'bench', 'http://localhost', tracking=tracking,
+                                 full_scan_interval=full_scan_interval, reporter=NullReporter())
+        results[name] = _time_per_frame(tracker.process_frame, frames)
+        results[name] += (len(tracker.marker_last_times),)
+        tracker.close()
+
+    print(f"artwork tracking @ {resolution} ({iterations} frames, {num_markers} markers, "
+          f"full_scan_interval={full_scan_interval})")
+    for name, (wall, cpu, seen) in results.items():
+        print(f"  {name:10s} {wall:7.2f} ms wall  {cpu:7.2f} ms cpu  "
+              f"{1000 / wall:6.1f} fps  markers seen={seen}")
+    print(f"  speedup:   {results['full scan'][0] / results['tracking'][0]:7.2f}x")
+
+class StageTimer:
+    """Collects per-frame wall time of named pipeline stages"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def time(self, stage, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.samples.setdefault(stage, []).append((time.perf_counter() - started) * 1000)
+        return result
+
+    def summary(self, frames):
+        total = sum(sum(values) for values in self.samples.values())
+        return {
+            'fps': round(frames * 1000 / total, 2) if total else None,
+            'stages_ms': {
+                stage: {
+                    'mean': round(float(np.mean(values)), 3),
+                    'p50': round(float(np.percentile(values, 50)), 3),
+                    'p95': round(float(np.percentile(values, 95)), 3),
+                    'p99': round(float(np.percentile(values, 99)), 3),
+                }
+                for stage, values in self.samples.items()
+            }
+        }
+
+def _recall(found, expected):
+    return round(found / expected, 4) if expected else None
+
+def suite_process_frame(frames, truths):
+    """ArucoProcessor.process_frame, split into its detect/overlay/encode stages"""
+    processor = ArucoProcessor()
+    timer = StageTimer()
+    found = expected = 0
+    for frame, truth in zip(frames, truths):
+        frame = frame.copy()  # The overlay draws in place
+        height, width = frame.shape[:2]
+        corners, ids, _ = timer.time('detect', processor.detector.detectMarkers, frame)
+        result = processor._build_result(corners, ids, width, height, 0.0)
+        timer.time('overlay', processor.draw_overlay, frame, corners, ids, result)
+        timer.time('encode', encode_jpeg, frame, processor.jpeg_quality, processor.output_width)
+        found += len(set(result.ids) & set(truth))
+        expected += len(truth)
+    return dict(timer.summary(len(frames)), recall=_recall(found, expected))
+
+def suite_center_check(frames, truths):
+    """ArucoProcessor.check_aruco_in_center (center ROI search)"""
+    processor = ArucoProcessor()
+    timer = StageTimer()
+    found = expected = 0
+    for frame, truth in zip(frames, truths):
+        height, width = frame.shape[:2]
+        half = min(width, height) // 4
+        in_center = {str(marker_id) for marker_id, (x, y) in truth.items()
+                     if abs(x - width // 2) < half and abs(y - height // 2) < half}
+        detected = timer.time('detect', processor.check_aruco_in_center, frame)
+        if in_center:
+            expected += 1
+            found += detected in in_center
+    return dict(timer.summary(len(frames)), recall=_recall(found, expected))
+
+def suite_tracker(frames, truths, tracking):
+    """ArtworkTracker.process_frame, split into detect and section accounting"""
+    tracker = ArtworkTracker('bench', 'bench', 'http://localhost', tracking=tracking, reporter=NullReporter())
+    timer = StageTimer()
+    found = expected = 0
+    try:
+        for index, (frame, truth) in enumerate(zip(frames, truths)):
+            height, width = frame.shape[:2]
+            if tracking:
+                corners, ids = timer.time('detect', tracker._detect, frame)
+            else:
+                corners, ids = timer.time('detect', tracker.detector.detectMarkers, frame)[:2]
+            if ids is not None and len(corners) > 0:
+                timer.time('section_accounting', tracker._update_sections,
+                           np.concatenate(corners).reshape(-1, 4, 2), ids.flatten(),
+                           width, height, index / 30.0)
+                found += len(set(int(i) for i in ids.flatten()) & set(truth))
+            expected += len(truth)
+    finally:
+        tracker.close()
+    return dict(timer.summary(len(frames)), recall=_recall(found, expected))
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_suite(resolutions, num_markers, num_frames, noise, blur):
+    """
+    Run every target over synthetic footage at each resolution.
+    Returns:
+        JSON-serializable results
+    """
+    results = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        frames, truths = render_moving_frames(width, height, num_markers, num_frames,
+                                              noise=noise, blur=blur)
+        targets = {
+            'ArucoProcessor.process_frame': lambda: suite_process_frame(frames, truths),
+            'ArucoProcessor.check_aruco_in_center': lambda: suite_center_check(frames, truths),
+            'ArtworkTracker.process_frame': lambda: suite_tracker(frames, truths, False),
+            'ArtworkTracker.process_frame[tracking]': lambda: suite_tracker(frames, truths, True),
+        }
+        for target, run in targets.items():
+            results.append(dict(run(), target=target, resolution=resolution))
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'opencv': cv2.__version__,
+        'config': {'markers': num_markers, 'frames': num_frames, 'noise': noise, 'blur': blur},
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ArUco detection and streaming")
+    subparsers = parser.add_subparsers(dest='command')
+
+    suite = subparsers.add_parser('suite', help="Run the synthetic benchmark suite and emit JSON")
+    suite.add_argument('--resolutions', nargs='+', choices=RESOLUTIONS, default=list(RESOLUTIONS))
+    suite.add_argument('--markers', type=int, default=3)
+    suite.add_argument('--frames', type=int, default=200)
+    suite.add_argument('--noise', type=float, default=0.0)
+    suite.add_argument('--blur', type=int, default=0)
+    suite.add_argument('--output', help="Write JSON here instead of stdout")
+
+    compare = subparsers.add_parser('compare', help="Before/after comparisons of individual optimizations")
+    compare.add_argument('--resolution', choices=RESOLUTIONS, default='1080p')
+    compare.add_argument('--iterations', type=int, default=100)
+    compare.add_argument('--jpeg-quality', type=int, default=80)
+    compare.add_argument('--output-width', type=int, default=None)
+    compare.add_argument('--detect-scale', type=float, default=0.5)
+    compare.add_argument('--markers', type=int, default=3)
+    compare.add_argument('--full-scan-interval', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == 'suite':
+        report = json.dumps(run_suite(args.resolutions, args.markers, args.frames,
+                                      args.noise, args.blur), indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(report + '\n')
+        else:
+            print(report)
+    elif args.command == 'compare':
+        bench_stream_encode(args.resolution, args.iterations, args.jpeg_quality, args.output_width)
+        bench_center_detection(args.resolution, args.iterations, args.detect_scale)
+        bench_tracking(args.resolution, args.iterations, args.markers, args.full_scan_interval)
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+def make_report(camera_index, kind):
+    """Build a start or update report like ArtworkTracker sends"""
+    report = {
+        'camera_id': f'pi_{camera_index:03d}',
+        'artwork_id': f'artwork_{camera_index:03d}',
+        'aruco_id': random.randint(0, 49),
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    if kind == 'update':
+        section_times = {str(s): random.uniform(0, 60) for s in (1, 2, 3)}
+        report['section_times'] = section_times
+        report['total_time'] = sum(section_times.values())
+    return report
+
+def create_test_app(database_url=None):
+    """Import the app against a scratch SQLite database (unless one is given)"""
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('VIDEO_SOURCE', '')  # Test pattern, no camera needed
+    from app import app
+    return app
+
+def bench_wire_format(records):
+    """Compare payload size and encode/decode time of JSON and the compact format"""
+    from wire_format import decode_records, encode_records
+
+    batch = [dict(make_report(i % 50, kind), type=kind)
+             for i, kind in enumerate(random.choice(('start', 'update')) for _ in range(records))]
+
+    started = time.perf_counter()
+    as_json = json.dumps({'records': batch}).encode('utf-8')
+    json_encode = time.perf_counter() - started
+    started = time.perf_counter()
+    json.loads(as_json)
+    json_decode = time.perf_counter() - started
+
+    started = time.perf_counter()
+    compact = encode_records(batch)
+    compact_encode = time.perf_counter() - started
+    started = time.perf_counter()
+    decode_records(compact)
+    compact_decode = time.perf_counter() - started
+
+    print(f"wire format ({records} records)")
+    print(f"  json:         {len(as_json):9d} bytes  encode {json_encode * 1000:7.2f} ms  "
+          f"decode {json_decode * 1000:7.2f} ms")
+    print(f"  json + gzip:  {len(gzip.compress(as_json)):9d} bytes")
+    print(f"  compact:      {len(compact):9d} bytes  encode {compact_encode * 1000:7.2f} ms  "
+          f"decode {compact_decode * 1000:7.2f} ms")
+
+def bench_ingest(client, records, batch_size):
+    """Compare rows/sec of the single-record routes with /observation/batch"""
+    reports = [(kind, make_report(i % 50, kind))
+               for i, kind in enumerate(random.choice(('start', 'update')) for _ in range(records))]
+
+    started = time.perf_counter()
+    for kind, report in reports:
+        client.post(f'/observation/{kind}', json=report)
+    single = records / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for offset in range(0, records, batch_size):
+        chunk = reports[offset:offset + batch_size]
+        client.post('/observation/batch',
+                    json={'records': [dict(report, type=kind) for kind, report in chunk]})
+    batched = records / (time.perf_counter() - started)
+
+    print(f"ingest ({records} records, batch_size={batch_size})")
+    print(f"  single-record routes: {single:9.1f} rows/s")
+    print(f"  /observation/batch:   {batched:9.1f} rows/s")
+    print(f"  speedup:              {batched / single:9.2f}x")
+
+def bench_writes(app, records, writers, flush_size):
+    """
+    The ingest write path in-process, without HTTP: every row inserted and
+    committed in its own transaction (INGEST_MODE=direct, one report per
+    request) against the same rows submitted one at a time to a
+    WriteBehindBuffer, from the same number of concurrent writers.
+    """
+    import rollups
+    from app import db
+    from models import ArtworkObservation
+    from write_buffer import WriteBehindBuffer
+
+    rows = [ArtworkObservation.row_from_report(make_report(i % 50, 'update')) for i in range(records)]
+    shares = [rows[w::writers] for w in range(writers)]
+
+    def run(write_row):
+        latencies = []
+
+        def writer(share):
+            for row in share:
+                started = time.perf_counter()
+                write_row(row)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            list(pool.map(writer, shares))
+        return records / (time.perf_counter() - started), latencies
+
+    def per_row(row):
+        with app.app_context():
+            db.session.execute(db.insert(ArtworkObservation), [row])
+            rollups.apply_observation_rows([row])
+            db.session.commit()
+
+    def buffered(durability):
+        buffer = WriteBehindBuffer(app, db, flush_size=flush_size, durability=durability,
+                                   max_pending=records,
+                                   before_commit=lambda grouped: rollups.apply_observation_rows(
+                                       grouped.get(ArtworkObservation, [])))
+        submit = lambda row: buffer.submit({ArtworkObservation: [row]})
+        if durability == 'flush':
+            rate, latencies = run(lambda row: submit(row).result())
+            buffer.close()
+            return rate, latencies
+        # Rows only count once committed: time until the buffer has drained
+        started = time.perf_counter()
+        _, latencies = run(submit)
+        buffer.close()
+        return records / (time.perf_counter() - started), latencies
+
+    results = [('per-row commit', *run(per_row)),
+               ('write-behind (flush)', *buffered('flush')),
+               ('write-behind (enqueue)', *buffered('enqueue'))]
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    print(f"write path ({records} rows, {writers} writers, flush_size={flush_size}, {dialect})")
+    for name, rate, latencies in results:
+        print(f"  {name:24s} {rate:9.1f} rows/s  p50 {np.percentile(latencies, 50):7.2f} ms  "
+              f"p99 {np.percentile(latencies, 99):7.2f} ms")
+    print(f"  speedup (flush):         {results[1][1] / results[0][1]:9.2f}x")
+
+class LoadStats:
+    """Thread-safe per-route latency and error bookkeeping"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, latency, ok):
+        with self.lock:
+            self.latencies[route].append(latency * 1000)
+            if not ok:
+                self.errors[route] += 1
+
+    def summary(self, elapsed):
+        summary = {}
+        for route, values in sorted(self.latencies.items()):
+            summary[route] = {
+                'requests': len(values),
+                'throughput_rps': round(len(values) / elapsed, 1),
+                'p50_ms': round(float(np.percentile(values, 50)), 2),
+                'p95_ms': round(float(np.percentile(values, 95)), 2),
+                'p99_ms': round(float(np.percentile(values, 99)), 2),
+                'error_rate': round(self.errors[route] / len(values), 4),
+            }
+        return summary
+
+def simulate_camera(base_url, camera_index, deadline, stats, report_interval, analytics_every):
+    """One camera's traffic: register, then start/update reports until the deadline"""
+    import requests
+
+    session = requests.Session()
+
+    def call(route, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, f"{base_url}{path}", timeout=30, **kwargs)
+            ok = response.ok
+        except requests.RequestException:
+            ok = False
+        stats.record(route, time.perf_counter() - started, ok)
+
+    camera_id = f'pi_{camera_index:03d}'
+    call('register', 'POST', '/api/camera/register', json={
+        'camera_id': camera_id,
+        'location': f'Gallery {camera_index}',
+        'artwork_ids': [f'artwork_{camera_index:03d}']
+    })
+
+    cycle = 0
+    while time.monotonic() < deadline:
+        call('start', 'POST', '/observation/start', json=make_report(camera_index, 'start'))
+        call('update', 'POST', '/observation/update', json=make_report(camera_index, 'update'))
+        if analytics_every and cycle % analytics_every == 0:
+            call('analytics', 'GET', '/api/analytics')
+        cycle += 1
+        if report_interval:
+            time.sleep(random.uniform(0, 2 * report_interval))
+
+def serve_local_app(port, database_url=None):
+    """Run the app on a threaded local server backed by a scratch SQLite database"""
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', port, create_test_app(database_url), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_load(base_url, cameras, duration, report_interval, analytics_every):
+    """
+    Simulate many cameras hitting the ingest and analytics routes concurrently,
+    one client thread per camera.
+    Returns:
+        JSON-serializable per-route throughput, latency percentiles and error rates
+    """
+    stats = LoadStats()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=cameras) as pool:
+        for camera_index in range(cameras):
+            pool.submit(simulate_camera, base_url, camera_index, deadline, stats,
+                        report_interval, analytics_every)
+    elapsed = time.perf_counter() - started
+    return {
+        'base_url': base_url,
+        'config': {'cameras': cameras, 'duration': duration, 'report_interval': report_interval, 'analytics_every': analytics_every},
+        'elapsed_s': round(elapsed, 2),
+        'routes': stats.summary(elapsed),
+    }
+
+def run_sqlite(profile, writers, readers, duration, batch_size, seed_rows=20000):
+    """
+    Concurrent read/write throughput of a scratch SQLite file, opened the way
+    the app opens it with SQLITE_PROFILE=default or tuned. Writers insert
+    observation batches in their own transactions while readers run the
+    analytics-style aggregate the dashboard issues.
+    """
+    from datetime import timedelta
+
+    import sqlalchemy as sa
+
+    import sqlite_profile
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    options = {'pool_recycle': 300, 'pool_pre_ping': True}
+    if profile == 'tuned':
+        options.update(sqlite_profile.engine_options(pool_size=writers + readers))
+    engine = sa.create_engine(url, **options)
+    if profile == 'tuned':
+        sqlite_profile.apply(engine)
+
+    metadata = sa.MetaData()
+    observations = sa.Table(
+        'artwork_observations', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('artwork_id', sa.String(50), nullable=False),
+        sa.Column('aruco_id', sa.Integer, nullable=False),
+        sa.Column('start_time', sa.DateTime, nullable=False, index=True),
+        sa.Column('total_time', sa.Float),
+    )
+    metadata.create_all(engine)
+
+    def rows(count):
+        now = datetime.utcnow()
+        return [{'artwork_id': f'artwork_{random.randint(0, 49):03d}', 'aruco_id': random.randint(0, 49),
+                 'start_time': now - timedelta(seconds=random.uniform(0, 86400)),
+                 'total_time': random.uniform(0, 60)} for _ in range(count)]
+
+    with engine.begin() as conn:
+        conn.execute(observations.insert(), rows(seed_rows))
+
+    aggregate = sa.select(observations.c.artwork_id, sa.func.count(), sa.func.sum(observations.c.total_time))\
+        .where(observations.c.start_time >= sa.bindparam('since'))\
+        .group_by(observations.c.artwork_id)
+
+    stats = LoadStats()
+    deadline = time.monotonic() + duration
+
+    def timed(route, work):
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                work()
+                ok = True
+            except sa.exc.OperationalError:  # "database is locked"
+                ok = False
+            stats.record(route, time.perf_counter() - started, ok)
+
+    def write():
+        with engine.begin() as conn:
+            conn.execute(observations.insert(), rows(batch_size))
+
+    def read():
+        with engine.connect() as conn:
+            conn.execute(aggregate, {'since': datetime.utcnow() - timedelta(hours=1)}).all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers + readers) as pool:
+        for _ in range(writers):
+            pool.submit(timed, 'write', write)
+        for _ in range(readers):
+            pool.submit(timed, 'read', read)
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return stats.summary(elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the server's ingest path")
+    subparsers = parser.add_subparsers(dest='command')
+
+    ingest = subparsers.add_parser('ingest', help="Wire format sizes and single vs batch ingest rows/sec")
+    ingest.add_argument('--database-url', default=None,
+                        help="Database to benchmark against (default: scratch SQLite file)")
+    ingest.add_argument('--records', type=int, default=2000)
+    ingest.add_argument('--batch-size', type=int, default=100)
+
+    writes = subparsers.add_parser('writes', help="Per-row commit vs write-behind group commit, in-process")
+    writes.add_argument('--database-url', default=None,
+                        help="Database to benchmark against (default: scratch SQLite file)")
+    writes.add_argument('--records', type=int, default=5000)
+    writes.add_argument('--writers', type=int, default=8, help="Concurrent writer threads")
+    writes.add_argument('--flush-size', type=int, default=500)
+
+    load = subparsers.add_parser('load', help="Concurrent multi-camera load test over HTTP")
+    load.add_argument('--url', default=None,
+                      help="Server to load (default: start a local SQLite-backed app)")
+    load.add_argument('--database-url', default=None,
+                      help="Database for the local app (default: scratch SQLite file)")
+    load.add_argument('--port', type=int, default=5055)
+    load.add_argument('--ingest-mode', choices=('direct', 'flush', 'enqueue'), default=None,
+                      help="INGEST_MODE for the local app (compare direct vs group commit)")
+    load.add_argument('--cameras', type=int, default=200)
+    load.add_argument('--duration', type=float, default=30.0)
+    load.add_argument('--report-interval', type=float, default=0.0,
+                      help="Mean pause between a camera's report cycles, in seconds (0 = flat out)")
+    load.add_argument('--analytics-every', type=int, default=10,
+                      help="Fetch /api/analytics every N report cycles per camera (0 = never)")
+    load.add_argument('--output', help="Write JSON here instead of stdout")
+
+    sqlite = subparsers.add_parser('sqlite', help="Concurrent SQLite read/write throughput, default vs tuned profile")
+    sqlite.add_argument('--writers', type=int, default=4)
+    sqlite.add_argument('--readers', type=int, default=8)
+    sqlite.add_argument('--duration', type=float, default=10.0)
+    sqlite.add_argument('--batch-size', type=int, default=20, help="Rows inserted per write transaction")
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        bench_wire_format(args.records)
+        app = create_test_app(args.database_url)
+        bench_ingest(app.test_client(), args.records, args.batch_size)
+    elif args.command == 'writes':
+        bench_writes(create_test_app(args.database_url), args.records, args.writers, args.flush_size)
+    elif args.command == 'load':
+        server = None
+        base_url = args.url
+        if base_url is None:
+            if args.ingest_mode:
+                os.environ['INGEST_MODE'] = args.ingest_mode
+            server = serve_local_app(args.port, args.database_url)
+            base_url = f'http://127.0.0.1:{args.port}'
+        try:
+            report = json.dumps(run_load(base_url.rstrip('/'), args.cameras, args.duration,
+                                         args.report_interval, args.analytics_every), indent=2)
+        finally:
+            if server is not None:
+                server.shutdown()
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(report + '\n')
+        else:
+            print(report)
+    elif args.command == 'sqlite':
+        report = {profile: run_sqlite(profile, args.writers, args.readers, args.duration, args.batch_size)
+                  for profile in ('default', 'tuned')}
+        print(json.dumps(report, indent=2))
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
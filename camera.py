@@ -2,10 +2,29 @@ import cv2
 import numpy as np
 import logging
 import os
-from threading import Lock
+import time
+from threading import Condition, Event, Lock, Thread
+
+def encode_jpeg(frame, quality=95, max_width=None):
+    """
+    Encode a BGR frame as JPEG bytes.
+    Args:
+        frame: BGR numpy array
+        quality: JPEG quality (0-100)
+        max_width: If set, frames wider than this are downscaled (keeping
+            the aspect ratio) before encoding
+    Returns:
+        JPEG bytes or None if encoding failed
+    """
+    height, width = frame.shape[:2]
+    if max_width and width > max_width:
+        frame = cv2.resize(frame, (max_width, int(height * max_width / width)),
+                           interpolation=cv2.INTER_AREA)
+    ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return jpeg.tobytes() if ret else None
 
 class Camera:
-    def __init__(self, video_source=0):
+    def __init__(self, video_source=0, jpeg_quality=95, max_width=None, latest_frame=False):
         """
         Initialize camera with video source.
         Args:
@@ -16,14 +35,37 @@ class Camera:
                 - camera = Camera(0)  # Use default webcam
                 - camera = Camera(1)  # Use second webcam
                 - camera = Camera("videos/sample.mp4")  # Use video file
+            jpeg_quality: JPEG quality used when get_frame() returns encoded bytes
+            max_width: Downscale encoded frames wider than this (None keeps full size)
+            latest_frame: If True, a reader thread drains the source continuously
+                and get_frame() returns the newest frame instead of the next
+                buffered one. Frames nobody asks for are only grabbed, never
+                decoded. Video files are paced at their CAP_PROP_FPS.
         """
         self.video = None
         self.test_pattern = None
         self.video_source = video_source
+        # VIDEO_SOURCE arrives as a string even for device indexes like "0"
+        self.is_file = isinstance(video_source, str) and os.path.isfile(video_source)
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
         self.lock = Lock()  # Add thread synchronization
 
+        # Latest-frame mode state. Only the reader thread touches self.video;
+        # consumers exchange frames with it under _frame_ready, which is never
+        # held across a grab() or retrieve().
+        self.latest_frame = latest_frame
+        self._frame_ready = Condition()
+        self._frame = None  # Newest decoded frame
+        self._frame_time = 0.0  # Capture time of _frame
+        self._published = 0  # Frames decoded by the reader thread
+        self._consumed = 0  # Value of _published when a consumer last took _frame
+        self._wanted = False  # A consumer is waiting for a fresh frame
+        self._stop_reader = Event()
+        self._reader = None
+
         try:
-            if isinstance(video_source, str) and os.path.isfile(video_source):
+            if self.is_file:
                 self.video = cv2.VideoCapture(video_source)
                 logging.info(f"Opened video file: {video_source}")
             else:
@@ -46,20 +88,103 @@ class Camera:
                        (255, 255, 255), 
                        2)
 
+        if self.latest_frame and self.video is not None:
+            self._reader = Thread(target=self._read_loop, name='camera-reader', daemon=True)
+            self._reader.start()
+
     def __del__(self):
         self.release()
 
     def release(self):
         """Safely release video resources"""
-        if self.video is not None:
-            self.video.release()
-            self.video = None
+        self._stop_reader.set()
+        if self._reader is not None and self._reader.is_alive():
+            self._reader.join(timeout=1)
+        with self.lock:
+            if self.video is not None:
+                self.video.release()
+                self.video = None
+
+    def _read_loop(self):
+        """
+        Reader thread for latest-frame mode: grab every frame as it arrives,
+        and decode one only when a consumer is waiting for it
+        """
+        is_file = self.is_file
+        fps = self.video.get(cv2.CAP_PROP_FPS) if is_file else 0
+        interval = 1.0 / fps if fps and fps > 0 else 0
+        next_due = time.monotonic()
+
+        while not self._stop_reader.is_set():
+            if is_file and interval:
+                # Play files back in real time instead of as fast as we can decode
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_due = max(next_due + interval, time.monotonic() - interval)
+
+            frame = None
+            with self.lock:
+                if self.video is None:
+                    return
+                try:
+                    success = self.video.grab()
+                    if not success and is_file:
+                        self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        success = self.video.grab()
+                    captured = time.time()
+                    if success and self._wanted:
+                        success, frame = self.video.retrieve()
+                except Exception as e:
+                    logging.error(f"Error grabbing frame: {str(e)}")
+                    success = False
+
+            if frame is not None:
+                with self._frame_ready:
+                    self._frame = frame
+                    self._frame_time = captured
+                    self._published += 1
+                    self._wanted = False
+                    self._frame_ready.notify_all()
+            if not success:
+                time.sleep(0.1)
+
+    def _latest(self, timeout=1.0):
+        """
+        Ask the reader thread for the next frame it grabs and wait for it,
+        falling back to the previous frame if none arrives within timeout
+        """
+        with self._frame_ready:
+            if self._published == self._consumed:
+                self._wanted = True
+                self._frame_ready.wait_for(lambda: self._published != self._consumed, timeout)
+            frame, frame_time = self._frame, self._frame_time
+            self._consumed = self._published
+        if frame is None:
+            return None, 0.0
+        # Callers draw on the frame, and the same frame may be returned again
+        return frame.copy(), frame_time
+
+    def get_timestamped_frame(self):
+        """
+        Get the next raw frame together with its capture time.
+        Returns:
+            (frame, capture time as epoch seconds), or (None, 0.0)
+        In latest-frame mode this is the next frame the reader thread grabs,
+        decoded on request, so the wait and the frame's age are each bounded
+        by one frame interval.
+        """
+        if self.latest_frame and self._reader is not None:
+            return self._latest()
+        return self.get_frame(raw=True), time.time()
 
     def get_frame(self, raw=False):
         """
         Get the next frame from the video source.
         Args:
-            raw: If True, returns the raw frame instead of JPEG bytes
+            raw: If True, returns the raw frame instead of JPEG bytes. Use this
+                when the frame is processed further (e.g. by ArucoProcessor) so
+                it is only encoded once, at the end.
         Returns:
             Frame data (as raw numpy array or JPEG bytes) or None if no frame is available
 
@@ -71,6 +196,12 @@ class Camera:
         - Continuously captures frames
         - Falls back to test pattern if camera becomes unavailable
         """
+        if self.latest_frame and self._reader is not None:
+            frame, _ = self._latest()
+            if frame is None:
+                return None
+            return frame if raw else self._encode(frame)
+
         frame = None
         with self.lock:  # Ensure thread-safe access to video device
             try:
@@ -78,7 +209,7 @@ class Camera:
                     success, frame = self.video.read()
                     if not success:
                         # For video files, loop back to start
-                        if isinstance(self.video_source, str):
+                        if self.is_file:
                             self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
                             success, frame = self.video.read()
                             if not success:
@@ -97,10 +228,11 @@ class Camera:
 
         if raw:
             return frame
+        return self._encode(frame)
 
+    def _encode(self, frame):
         try:
-            ret, jpeg = cv2.imencode('.jpg', frame)
-            return jpeg.tobytes() if ret else None
+            return encode_jpeg(frame, self.jpeg_quality, self.max_width)
         except Exception as e:
             logging.error(f"Error encoding frame: {str(e)}")
             return None
\ No newline at end of file
@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Optional
+
+from models import CheckIn, CHECKIN_COOLDOWN
+
+@dataclass(frozen=True)
+class CheckInState:
+    id: int  # Primary key of the latest CheckIn row
+    status: str
+    check_in_time: datetime
+    check_out_time: Optional[datetime]
+
+    @classmethod
+    def from_checkin(cls, checkin):
+        return cls(checkin.id, checkin.status, checkin.check_in_time, checkin.check_out_time)
+
+    @property
+    def cooldown_until(self) -> Optional[datetime]:
+        if not self.check_out_time:
+            return None
+        return self.check_out_time + timedelta(seconds=CHECKIN_COOLDOWN)
+
+    @property
+    def can_check_in(self) -> bool:
+        # Same rule as CheckIn.can_check_in
+        return self.cooldown_until is not None and datetime.utcnow() >= self.cooldown_until
+
+class CheckInIndex:
+    def __init__(self):
+        """
+        Write-through, in-process index of each marker's latest check-in.
+
+        Entries are loaded lazily from the database on first lookup (markers
+        with no history are cached too) and replaced by record() whenever
+        this process writes a check-in or checkout, so the kiosk polling path
+        does not query the database. Writes made by other processes are not
+        seen; run a single worker or call invalidate() if the check_in table
+        is modified elsewhere.
+        """
+        self._lock = Lock()
+        self._states: Dict[str, Optional[CheckInState]] = {}
+
+    def get(self, aruco_id: str) -> Optional[CheckInState]:
+        """Return the latest check-in state for a marker, or None if it never checked in"""
+        with self._lock:
+            if aruco_id in self._states:
+                return self._states[aruco_id]
+
+        latest = CheckIn.get_latest_by_aruco(aruco_id)
+        state = CheckInState.from_checkin(latest) if latest else None
+        with self._lock:
+            # A concurrent record() wins over a value loaded before it
+            return self._states.setdefault(aruco_id, state)
+
+    def record(self, checkin) -> None:
+        """Store the state of a just-committed CheckIn row"""
+        with self._lock:
+            self._states[checkin.aruco_id] = CheckInState.from_checkin(checkin)
+
+    def invalidate(self, aruco_id: Optional[str] = None) -> None:
+        """Drop one marker (or every marker) so it is reloaded from the database"""
+        with self._lock:
+            if aruco_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(aruco_id, None)
@@ -0,0 +1,87 @@
+import json
+import logging
+import queue
+from threading import Lock, Timer
+
+class EventBroker:
+    def __init__(self, max_pending=100):
+        """
+        Fan-out of server events to Server-Sent Events subscribers.
+        Args:
+            max_pending: Events buffered per subscriber; when a client falls
+                this far behind its oldest events are dropped
+
+        The latest event of each topic is retained and replayed to new
+        subscribers, so a page gets the current state as soon as it connects
+        without a separate fetch.
+        """
+        self.max_pending = max_pending
+        self._lock = Lock()
+        self._subscribers = {}  # queue -> set of topics
+        self._latest = {}  # topic -> latest encoded message
+        self._timers = {}  # topic -> pending debounce Timer
+
+    def subscribe(self, topics):
+        subscriber = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers[subscriber] = set(topics)
+            for topic in topics:
+                if topic in self._latest:
+                    subscriber.put_nowait(self._latest[topic])
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    def publish(self, topic, data):
+        """Send an event to every subscriber of topic. The payload is encoded once."""
+        message = f"event: {topic}\ndata: {json.dumps(data)}\n\n"
+        with self._lock:
+            self._latest[topic] = message
+            subscribers = [s for s, topics in self._subscribers.items() if topic in topics]
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Drop the oldest event for this slow client rather than block
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def publish_later(self, topic, build, delay=2.0):
+        """
+        Publish build() for topic after delay seconds, coalescing every call
+        made in the meantime into a single build. Used for payloads that are
+        expensive to compute, so their cost follows the event rate and not the
+        number of connected pages.
+        """
+        def fire():
+            with self._lock:
+                self._timers.pop(topic, None)
+            try:
+                self.publish(topic, build())
+            except Exception as e:
+                logging.error(f"Error publishing {topic} event: {str(e)}")
+
+        with self._lock:
+            if topic in self._timers:
+                return
+            timer = Timer(delay, fire)
+            timer.daemon = True
+            self._timers[topic] = timer
+        timer.start()
+
+    def stream(self, topics, keepalive=15.0):
+        """Generator of SSE messages for one client"""
+        subscriber = self.subscribe(topics)
+        try:
+            while True:
+                try:
+                    yield subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
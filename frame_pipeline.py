@@ -0,0 +1,151 @@
+import logging
+import time
+from dataclasses import replace
+from threading import Condition, Lock, Thread
+
+from aruco_processor import DetectionResult
+
+
+class FramePipeline:
+    def __init__(self, camera, processor, interval=0.1, max_detection_age=2.0,
+                 center_only_when_unwatched=False):
+        """
+        Shared capture -> detect -> encode loop for the video feed.
+        Args:
+            camera: Camera instance frames are read from
+            processor: ArucoProcessor used to detect markers and draw the overlay
+            interval: Minimum time between processed frames, in seconds
+            max_detection_age: Seconds after which the latest detection is
+                considered stale and latest_detection() reports nothing
+            center_only_when_unwatched: While no client is subscribed to the
+                video feed, detect only in the processor's center box (ROI,
+                optionally downscaled) instead of the full frame.
+
+        Every frame is captured and detected exactly once, no matter how many
+        clients are watching. The overlay is drawn and the frame JPEG-encoded
+        only while at least one client is subscribed to the video feed.
+        Subscribers always receive the newest frame; frames a slow client
+        could not keep up with are skipped for that client only.
+        """
+        self.camera = camera
+        self.processor = processor
+        self.interval = interval
+        self.center_only_when_unwatched = center_only_when_unwatched
+
+        self._condition = Condition()
+        self._frame = None  # Latest annotated JPEG bytes
+        self._sequence = 0  # Incremented for every published frame
+        self._viewers = 0  # Clients currently iterating subscribe()
+        self._detections = 0  # Incremented for every published detection
+        self.max_detection_age = max_detection_age
+        self._detection = DetectionResult()  # Replaced, never mutated, on publish
+        self._listeners = []  # Called with each new DetectionResult on the pipeline thread
+
+        self._start_lock = Lock()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """Start the background loop if it is not already running"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = Thread(target=self._run, name='frame-pipeline', daemon=True)
+            self._thread.start()
+            logging.info("Frame pipeline started")
+
+    def stop(self):
+        """Stop the background loop and wake any waiting subscribers"""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            started = time.monotonic()
+            try:
+                frame, captured = self.camera.get_timestamped_frame()
+                if frame is not None and not self._viewers:
+                    # Only the detection is needed: skip the overlay and encode
+                    detect = self.processor.detect_center if self.center_only_when_unwatched \
+                        else self.processor.detect
+                    self._publish(None, detect(frame, captured))
+                elif frame is not None:
+                    jpeg, result = self.processor.annotate_frame(frame, captured)
+                    if jpeg is not None:
+                        self._publish(jpeg, result)
+            except Exception as e:
+                logging.error(f"Error in frame pipeline: {str(e)}")
+
+            elapsed = time.monotonic() - started
+            if elapsed < self.interval:
+                time.sleep(self.interval - elapsed)
+
+    def add_listener(self, callback):
+        """Register callback(DetectionResult), run on the pipeline thread after every frame"""
+        self._listeners.append(callback)
+
+    def _publish(self, jpeg, result):
+        """Publish a detection, and a new video frame unless jpeg is None"""
+        with self._condition:
+            self._detections += 1
+            self._detection = replace(result, version=self._detections)
+            if jpeg is not None:
+                self._frame = jpeg
+                self._sequence += 1
+                self._condition.notify_all()
+
+        for listener in self._listeners:
+            try:
+                listener(self._detection)
+            except Exception as e:
+                logging.error(f"Error in detection listener: {str(e)}")
+
+    def latest_detection(self):
+        """
+        Return the DetectionResult of the most recently processed frame.
+        No image work is done here; the result is a reference swap away
+        from the pipeline thread. Stale results (older than
+        max_detection_age) are reported as an empty detection.
+        """
+        self.start()
+        detection = self._detection
+        if time.time() - detection.timestamp > self.max_detection_age:
+            return DetectionResult(timestamp=detection.timestamp, version=detection.version)
+        return detection
+
+    def wait_for_frame(self, last_sequence=0, timeout=1.0):
+        """
+        Block until a frame newer than last_sequence is published.
+        Returns:
+            (sequence, jpeg) for the newest frame, or (last_sequence, None) on timeout
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._sequence != last_sequence or not self._running,
+                timeout=timeout
+            )
+            if self._sequence == last_sequence:
+                return last_sequence, None
+            return self._sequence, self._frame
+
+    def subscribe(self):
+        """Generator yielding MJPEG multipart chunks for one client"""
+        self.start()
+        with self._condition:
+            self._viewers += 1
+            # Don't replay a frame left over from before an unwatched period
+            sequence = self._sequence
+        try:
+            while self._running:
+                sequence, jpeg = self.wait_for_frame(sequence)
+                if jpeg is not None:
+                    yield (b'--frame\r\n'
+                           b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            with self._condition:
+                self._viewers -= 1
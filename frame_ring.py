@@ -0,0 +1,134 @@
+import logging
+from threading import Condition, Event, Thread
+from time import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+class FrameRing:
+    def __init__(self, shape: Tuple[int, ...], dtype=np.uint8, slots: int = 4):
+        """
+        Fixed-size ring of preallocated frame buffers shared by one capture
+        thread and one processing worker.
+        Args:
+            shape: Frame shape, e.g. (height, width, 3)
+            dtype: Frame dtype
+            slots: Number of buffers; at least 3, so the writer always has a
+                free slot besides the newest frame and the one being processed
+
+        The writer fills a free slot in place and publishes it as the newest
+        frame. The reader always takes the newest frame and holds its slot
+        until the next acquire(), so nothing it is looking at is overwritten
+        and no frame is ever copied or allocated.
+        """
+        if slots < 3:
+            raise ValueError("FrameRing needs at least 3 slots")
+        self.frames = np.zeros((slots,) + tuple(shape), dtype=dtype)
+        self.timestamps = np.zeros(slots)
+        self.slots = slots
+
+        self.written = 0  # Frames published by the writer
+        self.dropped = 0  # Frames overwritten before the reader got to them
+
+        self._cond = Condition()
+        self._newest = -1  # Slot holding the newest published frame
+        self._held = -1  # Slot the reader is processing
+        self._next = 0
+        self._consumed = 0  # Value of written when the reader last acquired
+        self.wanted = False  # The reader is waiting for a frame
+        self._closed = False
+
+    def writable_slot(self) -> int:
+        """Index of a slot the writer may fill: neither the newest nor the held frame"""
+        with self._cond:
+            slot = self._next
+            while slot in (self._newest, self._held):
+                slot = (slot + 1) % self.slots
+            self._next = (slot + 1) % self.slots
+            return slot
+
+    def publish(self, slot: int, timestamp: float) -> None:
+        """Make a filled slot the newest frame"""
+        with self._cond:
+            self.timestamps[slot] = timestamp
+            if self._newest >= 0:
+                self.dropped += 1
+            self._newest = slot
+            self.written += 1
+            self.wanted = False
+            self._cond.notify_all()
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Wait for a frame newer than the last one acquired and take it,
+        releasing the previously held slot.
+        Returns:
+            (frame view, capture timestamp), or None on timeout or close.
+            The view is valid until the next acquire().
+        """
+        with self._cond:
+            if self.written == self._consumed:
+                self.wanted = True
+            if not self._cond.wait_for(lambda: self.written > self._consumed or self._closed, timeout):
+                return None
+            if self._closed:
+                return None
+            self._held = self._newest
+            self._newest = -1
+            self._consumed = self.written
+            return self.frames[self._held], float(self.timestamps[self._held])
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class CaptureThread:
+    def __init__(self, cap, ring: FrameRing):
+        """
+        Read frames from a cv2.VideoCapture into a FrameRing on a background
+        thread, stamping each frame with its wall-clock capture time.
+
+        Every frame is grab()bed so the driver's buffer never goes stale, but
+        only frames the reader is waiting for are retrieve()d (decoded),
+        straight into the ring's buffers. Decode cost therefore follows the
+        processing rate, e.g. IDLE_FPS on an empty gallery, not the sensor rate.
+        """
+        self.cap = cap
+        self.ring = ring
+        self.grabbed = 0
+        self.failures = 0
+        self._stopping = Event()
+        self._thread = Thread(target=self._run, name='capture', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stopping.set()
+        self._thread.join(timeout=timeout)
+        self.ring.close()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                ret = self.cap.grab()
+                captured = time()
+                self.grabbed += ret
+                if ret and self.ring.wanted:
+                    slot = self.ring.writable_slot()
+                    buffer = self.ring.frames[slot]
+                    ret, frame = self.cap.retrieve(buffer)
+                    if ret and frame is not buffer:
+                        # The capture resized or reallocated; fall back to a copy
+                        np.copyto(buffer, frame)
+                    if ret:
+                        self.ring.publish(slot, captured)
+            except Exception as e:
+                logging.error(f"Error capturing frame: {str(e)}")
+                ret = False
+
+            if not ret:
+                self.failures += 1
+                logging.error("Failed to read frame")
+                self._stopping.wait(0.1)
@@ -0,0 +1,68 @@
+import time
+
+class FrameScheduler:
+    def __init__(self, active_fps=10.0, idle_fps=1.0, idle_decay=10.0):
+        """
+        Frame pacing for the Pi observer loop.
+        Args:
+            active_fps: Target rate while markers are visible or the scene is changing
+            idle_fps: Rate the scheduler decays to once the scene is empty and still
+            idle_decay: Seconds of inactivity over which the rate falls from
+                active_fps to idle_fps (exponentially); 0 drops to idle_fps at once
+
+        Each frame gets a time budget of 1 / target fps. Processing time is
+        subtracted from the budget instead of sleeping a fixed amount, and a
+        frame that overruns its budget counts the frame slots it missed as
+        dropped.
+        """
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.idle_decay = idle_decay
+
+        self.achieved_fps = 0.0  # Exponential moving average of the real frame rate
+        self.dropped_frames = 0  # Frame slots missed because processing overran its budget
+        self.frames = 0
+
+        now = time.monotonic()
+        self._last_active = now
+        self._active = True
+        self._frame_start = None
+        self._next_due = now
+
+    @property
+    def target_fps(self):
+        """Current frame rate: active_fps, decaying towards idle_fps while nothing happens"""
+        if self.idle_decay <= 0:
+            return self.active_fps if self._active else self.idle_fps
+        progress = min((time.monotonic() - self._last_active) / self.idle_decay, 1.0)
+        return self.active_fps * (self.idle_fps / self.active_fps) ** progress
+
+    def wait(self):
+        """Sleep until the next frame is due, then mark the start of that frame"""
+        delay = self._next_due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        now = time.monotonic()
+        if self._frame_start is not None:
+            instant = 1.0 / max(now - self._frame_start, 1e-6)
+            self.achieved_fps = instant if self.frames == 1 else 0.9 * self.achieved_fps + 0.1 * instant
+        self._frame_start = now
+
+    def frame_done(self, active):
+        """
+        Record the end of a frame.
+        Args:
+            active: True if markers were visible or the scene changed in this frame
+        """
+        now = time.monotonic()
+        self._active = active
+        if active:
+            self._last_active = now
+        self.frames += 1
+
+        interval = 1.0 / self.target_fps
+        self._next_due = self._frame_start + interval
+        if now > self._next_due:
+            self.dropped_frames += int((now - self._next_due) / interval)
+            self._next_due = now
@@ -1,7 +1,34 @@
 from app import db
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 
+import numpy as np
+
+from wire_format import decode_grid
+
+CHECKIN_COOLDOWN = 10  # Seconds after checkout before the same marker can check in again
+MAX_SECTIONS = 3  # ArtworkObservation stores section_1_time..section_3_time
+
+def parse_timestamp(value):
+    """Parse a report timestamp: ISO string, or epoch seconds from the compact wire format"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+    return datetime.fromisoformat(value)
+
+def report_string(value, column):
+    """str(value) for a String column, rejected if the database would not store it"""
+    value = str(value)
+    if len(value) > column.type.length:
+        raise ValueError(f"{column.key} longer than {column.type.length} characters")
+    return value
+
+def report_integer(value, column, minimum=0, maximum=2**31 - 1):
+    """int(value) for an Integer column, rejected if outside [minimum, maximum]"""
+    value = int(value)
+    if not minimum <= value <= maximum:
+        raise ValueError(f"{column.key} out of range: {value}")
+    return value
+
 class ObservationEvent(db.Model):
     __tablename__ = 'observation_events'
 
@@ -12,8 +39,23 @@ class ObservationEvent(db.Model):
     event_type = db.Column(db.String(20), nullable=False)  # 'start' or 'update'
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    @staticmethod
+    def row_from_report(data):
+        """Validate a /observation/start report and return the column values to insert"""
+        return {
+            'camera_id': report_string(data['camera_id'], ObservationEvent.camera_id),
+            'artwork_id': report_string(data['artwork_id'], ObservationEvent.artwork_id),
+            'aruco_id': report_integer(data['aruco_id'], ObservationEvent.aruco_id),
+            'event_type': 'start',
+            'timestamp': parse_timestamp(data['timestamp'])
+        }
+
 class CheckIn(db.Model):
     __tablename__ = 'check_in'
+    __table_args__ = (
+        # Covers get_latest_by_aruco: equality on aruco_id, newest check_in_time first
+        db.Index('ix_check_in_aruco_id_check_in_time', 'aruco_id', 'check_in_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     aruco_id = db.Column(db.String(50), nullable=False)
@@ -26,7 +68,7 @@ class CheckIn(db.Model):
         if not self.check_out_time:
             return False
         time_diff = datetime.utcnow() - self.check_out_time
-        return time_diff.total_seconds() >= 10
+        return time_diff.total_seconds() >= CHECKIN_COOLDOWN
 
     @classmethod
     def get_latest_by_aruco(cls, aruco_id):
@@ -34,12 +76,16 @@ class CheckIn(db.Model):
 
 class ArtworkObservation(db.Model):
     __tablename__ = 'artwork_observations'
+    __table_args__ = (
+        # Covers per-artwork time range scans for the analytics series
+        db.Index('ix_artwork_observations_artwork_id_start_time', 'artwork_id', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     camera_id = db.Column(db.String(50), nullable=False)
     artwork_id = db.Column(db.String(50), nullable=False)
     aruco_id = db.Column(db.Integer, nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     end_time = db.Column(db.DateTime, nullable=True)
     section_1_time = db.Column(db.Float, default=0.0)
     section_2_time = db.Column(db.Float, default=0.0)
@@ -54,6 +100,74 @@ class ArtworkObservation(db.Model):
             3: self.section_3_time
         }
 
+    @staticmethod
+    def row_from_report(data):
+        """
+        Validate a /observation/update report and return the column values to insert.
+        The final report of a session carries its start_time and end_time;
+        like other updates its times cover only what was not reported before,
+        and they may be zero when it only marks the end of the session.
+        """
+        section_times = data['section_times']
+        # JSON turns the tracker's integer section keys into strings
+        section = lambda n: float(section_times.get(n, section_times.get(str(n), 0.0)))
+        end_time = data.get('end_time')
+        return {
+            'camera_id': report_string(data['camera_id'], ArtworkObservation.camera_id),
+            'artwork_id': report_string(data['artwork_id'], ArtworkObservation.artwork_id),
+            'aruco_id': report_integer(data['aruco_id'], ArtworkObservation.aruco_id),
+            'start_time': parse_timestamp(data.get('start_time') or data['timestamp']),
+            'end_time': parse_timestamp(end_time) if end_time is not None else None,
+            'section_1_time': section(1),
+            'section_2_time': section(2),
+            'section_3_time': section(3),
+            'total_time': float(data['total_time'])
+        }
+
+class ArtworkDailyStats(db.Model):
+    """Per-day, per-artwork sums of ArtworkObservation rows, maintained on ingest"""
+    __tablename__ = 'artwork_daily_stats'
+
+    day = db.Column(db.Date, primary_key=True)
+    artwork_id = db.Column(db.String(50), primary_key=True)
+    observation_count = db.Column(db.Integer, nullable=False, default=0)
+    total_time = db.Column(db.Float, nullable=False, default=0.0)
+    section_1_time = db.Column(db.Float, nullable=False, default=0.0)
+    section_2_time = db.Column(db.Float, nullable=False, default=0.0)
+    section_3_time = db.Column(db.Float, nullable=False, default=0.0)
+
+class DailyVisitor(db.Model):
+    """Distinct ArUco ids observed per day, maintained on ingest"""
+    __tablename__ = 'daily_visitors'
+
+    day = db.Column(db.Date, primary_key=True)
+    aruco_id = db.Column(db.Integer, primary_key=True)
+
+class ArtworkHeatmap(db.Model):
+    """Per-day, per-artwork occupancy grid: dwell seconds per cell, summed over uploads"""
+    __tablename__ = 'artwork_heatmaps'
+
+    day = db.Column(db.Date, primary_key=True)
+    artwork_id = db.Column(db.String(50), primary_key=True)
+    rows = db.Column(db.Integer, nullable=False)
+    cols = db.Column(db.Integer, nullable=False)
+    grid = db.Column(db.LargeBinary, nullable=False)  # float32 cells, row-major
+
+    @property
+    def cells(self):
+        return np.frombuffer(self.grid, dtype='<f4').reshape(self.rows, self.cols)
+
+    @staticmethod
+    def row_from_report(data):
+        """Validate an /observation/heatmap report and return its day, artwork and grid"""
+        rows = report_integer(data['rows'], ArtworkHeatmap.rows, minimum=1)
+        cols = report_integer(data['cols'], ArtworkHeatmap.cols, minimum=1)
+        return {
+            'day': parse_timestamp(data['timestamp']).date(),
+            'artwork_id': report_string(data['artwork_id'], ArtworkHeatmap.artwork_id),
+            'grid': decode_grid(data['grid'], rows, cols)
+        }
+
 class Camera(db.Model):
     __tablename__ = 'cameras'
 
@@ -77,4 +191,17 @@ class Artwork(db.Model):
     name = db.Column(db.String(200), nullable=False)
     artist = db.Column(db.String(200))
     description = db.Column(db.Text)
-    location = db.Column(db.String(100))
\ No newline at end of file
+    location = db.Column(db.String(100))
+
+class Region(db.Model):
+    __tablename__ = 'regions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    camera_url = db.Column(db.String(500), nullable=False, index=True)
+    section = db.Column(db.Integer, nullable=False)  # 1-based section number reported by the tracker
+    name = db.Column(db.String(100))
+    points = db.Column(db.Text, nullable=False)  # JSON list of [x, y] in normalized (0-1) frame coordinates
+
+    @property
+    def polygon(self):
+        return json.loads(self.points)
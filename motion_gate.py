@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+
+class MotionGate:
+    def __init__(self, width=80, threshold=20, min_changed=0.002, max_skipped=50):
+        """
+        Cheap scene-change detector used to skip marker detection on unchanged frames.
+        Args:
+            width: Frames are compared as grayscale thumbnails this many pixels wide
+            threshold: Per-pixel intensity change (0-255) that counts as motion
+            min_changed: Fraction of thumbnail pixels that must change
+            max_skipped: Report a change at least every this many frames, so a
+                missed change cannot suppress detection indefinitely
+
+        Frames are compared with the frame of the last reported change rather
+        than the previous frame, so slow movement still accumulates into a change.
+        """
+        self.width = width
+        self.threshold = threshold
+        self.min_changed = min_changed
+        self.max_skipped = max_skipped
+        self._reference = None
+        self._skipped = 0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def changed(self, frame: np.ndarray) -> bool:
+        """Return True if frame differs enough from the last changed frame"""
+        thumbnail = self._thumbnail(frame)
+        if (self._reference is None or self._reference.shape != thumbnail.shape or
+                self._skipped >= self.max_skipped):
+            changed = True
+        else:
+            diff = cv2.absdiff(thumbnail, self._reference)
+            changed = np.count_nonzero(diff > self.threshold) >= self.min_changed * diff.size
+
+        if changed:
+            self._reference = thumbnail
+            self._skipped = 0
+        else:
+            self._skipped += 1
+        return changed
@@ -2,13 +2,42 @@ import cv2
 import time
 import logging
 import os
+import requests
 from artwork_tracker import ArtworkTracker
+from frame_ring import CaptureThread, FrameRing
+from frame_scheduler import FrameScheduler
+from motion_gate import MotionGate
+from reporter import Reporter
 
 # Configuration
 CAMERA_ID = os.environ.get('CAMERA_ID', 'pi_001')  # Unique ID for this Pi
 ARTWORK_ID = os.environ.get('ARTWORK_ID', 'artwork_001')  # ID of artwork being observed
 SERVER_URL = os.environ.get('SERVER_URL', 'http://your-aws-server.com')
 REPORT_INTERVAL = 30  # Send updates every 30 seconds
+TRACKING = os.environ.get('TRACKING', 'true').lower() == 'true'  # Search predicted windows between full scans
+FULL_SCAN_INTERVAL = int(os.environ.get('FULL_SCAN_INTERVAL', 10))  # Frames between full-frame scans
+SPOOL_PATH = os.environ.get('SPOOL_PATH', 'report_spool.db')  # Reports queued while the server is unreachable
+ACTIVE_FPS = float(os.environ.get('ACTIVE_FPS', 10))  # Frame rate while visitors are present
+IDLE_FPS = float(os.environ.get('IDLE_FPS', 1))  # Frame rate once the scene is empty and still
+IDLE_DECAY = float(os.environ.get('IDLE_DECAY', 10))  # Seconds to fall from ACTIVE_FPS to IDLE_FPS
+MOTION_GATE = os.environ.get('MOTION_GATE', 'true').lower() == 'true'  # Skip detection on unchanged empty frames
+COMPACT_REPORTS = os.environ.get('COMPACT_REPORTS', 'false').lower() == 'true'  # Binary+gzip reports
+SESSION_TIMEOUT = float(os.environ.get('SESSION_TIMEOUT', 10))  # Seconds out of view before a visit ends
+FRAME_BUFFERS = int(os.environ.get('FRAME_BUFFERS', 4))  # Preallocated capture ring slots
+CAMERA_URL = os.environ.get('CAMERA_URL')  # Stream URL the sections were drawn for on /camera_config
+
+def load_regions():
+    """Fetch the section polygons saved for this camera, or None for the default thirds"""
+    if not CAMERA_URL:
+        return None
+    try:
+        response = requests.get(f"{SERVER_URL.rstrip('/')}/api/regions",
+                                params={'camera_url': CAMERA_URL}, timeout=10)
+        regions = [r['points'] for r in response.json()] if response.ok else []
+        return regions or None
+    except Exception as e:
+        logging.error(f"Failed to load regions, using default sections: {str(e)}")
+        return None
 
 def main():
     # Initialize camera
@@ -17,40 +46,64 @@ def main():
         logging.error("Failed to open camera")
         return
 
+    # Size the capture ring from a first frame
+    ret, frame = cap.read()
+    if not ret:
+        logging.error("Failed to read frame")
+        cap.release()
+        return
+    ring = FrameRing(frame.shape, frame.dtype, slots=FRAME_BUFFERS)
+    capture = CaptureThread(cap, ring)
+
     # Initialize tracker
     tracker = ArtworkTracker(
         camera_id=CAMERA_ID,
         artwork_id=ARTWORK_ID,
-        server_url=SERVER_URL
+        server_url=SERVER_URL,
+        tracking=TRACKING,
+        full_scan_interval=FULL_SCAN_INTERVAL,
+        regions=load_regions(),
+        reporter=Reporter(SERVER_URL, spool_path=SPOOL_PATH, compact=COMPACT_REPORTS),
+        motion_gate=MotionGate() if MOTION_GATE else None,
+        session_timeout=SESSION_TIMEOUT
     )
 
+    scheduler = FrameScheduler(ACTIVE_FPS, IDLE_FPS, IDLE_DECAY)
     last_report_time = time.time()
 
+    # Capture runs on its own thread; this loop processes the newest frame
+    # and times dwell by when each frame was captured, not processed
+    capture.start()
     try:
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                logging.error("Failed to read frame")
+            scheduler.wait()
+            acquired = ring.acquire(timeout=1.0)
+            if acquired is None:
                 continue
+            frame, captured = acquired
 
             # Process frame
-            tracker.process_frame(frame)
+            tracker.process_frame(frame, captured)
+            scheduler.frame_done(active=tracker.is_active)
 
             # Report data periodically
             current_time = time.time()
             if current_time - last_report_time >= REPORT_INTERVAL:
                 tracker.report_section_times()
                 last_report_time = current_time
-
-            # Small delay to prevent excessive CPU usage
-            time.sleep(0.1)
+                logging.info(f"Frame rate {scheduler.achieved_fps:.1f} fps "
+                             f"(target {scheduler.target_fps:.1f}), "
+                             f"{scheduler.dropped_frames} dropped, {tracker.skipped_frames} gated, "
+                             f"{ring.written} of {capture.grabbed} captured frames decoded")
 
     except KeyboardInterrupt:
         logging.info("Shutting down...")
     except Exception as e:
         logging.error(f"Unexpected error: {str(e)}")
     finally:
+        capture.stop()
         cap.release()
+        tracker.close()
 
 if __name__ == "__main__":
     logging.basicConfig(
@@ -0,0 +1,260 @@
+import json
+import logging
+import queue
+import sqlite3
+import time
+from threading import Event, Thread
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from wire_format import CONTENT_TYPE as COMPACT_CONTENT_TYPE, encode_records
+
+# Non-5xx responses that mean "try again later" rather than that the report
+# itself is bad. Every 5xx is retried too: /observation/batch reports invalid
+# records individually inside a 200, so a 5xx is always a server-side failure.
+RETRY_STATUSES = (408, 429)
+
+# Record type expected by /observation/batch for each single-report route
+BATCH_TYPES = {
+    '/observation/start': 'start',
+    '/observation/update': 'update',
+    '/observation/heatmap': 'heatmap',
+}
+
+# Record types the compact wire format can carry; batches with others go as JSON
+COMPACT_TYPES = ('start', 'update')
+
+# (path, payload) pairs, e.g. ('/observation/start', {...})
+Report = Tuple[str, dict]
+
+class ReportSpool:
+    def __init__(self, path: Optional[str] = None, max_events: int = 100000):
+        """
+        Bounded FIFO of undelivered reports, backed by SQLite.
+        Args:
+            path: SQLite file to spool to. None keeps the spool in memory only.
+            max_events: Oldest events are dropped once the spool holds more than this
+        """
+        self.max_events = max_events
+        self.conn = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS spool ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL, payload TEXT NOT NULL)'
+        )
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+    def extend(self, reports: List[Report]) -> None:
+        self.conn.executemany('INSERT INTO spool (path, payload) VALUES (?, ?)',
+                              [(path, json.dumps(payload)) for path, payload in reports])
+        dropped = self.conn.execute(
+            'DELETE FROM spool WHERE id <= (SELECT MAX(id) FROM spool) - ?', (self.max_events,)
+        ).rowcount
+        self.conn.commit()
+        if dropped:
+            logging.warning(f"Report spool full, dropped {dropped} oldest events")
+
+    def peek(self, limit: int) -> List[Tuple[int, str, dict]]:
+        rows = self.conn.execute('SELECT id, path, payload FROM spool ORDER BY id LIMIT ?', (limit,))
+        return [(row_id, path, json.loads(payload)) for row_id, path, payload in rows]
+
+    def remove_through(self, row_id: int) -> None:
+        self.conn.execute('DELETE FROM spool WHERE id <= ?', (row_id,))
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+class Reporter:
+    def __init__(self, server_url: str, spool_path: Optional[str] = None,
+                 batch_size: int = 50, flush_interval: float = 1.0,
+                 retry_interval: float = 15.0, timeout: float = 5.0,
+                 max_queue: int = 10000, max_spool_events: int = 100000,
+                 compact: bool = False):
+        """
+        Background, non-blocking delivery of tracker reports to the server.
+        Args:
+            server_url: URL of the central server
+            spool_path: SQLite file undelivered reports are spooled to while the
+                server is unreachable. None keeps them in memory only.
+            batch_size: Maximum number of reports sent per request
+            flush_interval: Maximum time a report waits in memory before sending
+            retry_interval: Seconds between delivery attempts while spooling
+            timeout: HTTP timeout per request, in seconds
+            max_queue: Size of the in-memory queue; submit() drops reports
+                (with a warning) rather than block when it is full
+            max_spool_events: Bound on the on-disk spool
+            compact: Send batches in the gzip-compressed binary format from
+                wire_format.py instead of JSON
+
+        submit() only enqueues, so callers in the frame loop never wait on
+        the network. A worker thread sends reports over a pooled session;
+        when the server is down they are spooled and replayed, in order,
+        once it comes back.
+        """
+        self.server_url = server_url.rstrip('/')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.compact = compact
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._spool = ReportSpool(spool_path, max_spool_events)
+        self._next_retry = 0.0
+        self._deadline: Optional[float] = None  # Set by close()
+        self._stopping = Event()
+        self._thread = Thread(target=self._run, name='reporter', daemon=True)
+        self._thread.start()
+
+    def submit(self, path: str, payload: dict) -> None:
+        """Queue a report for delivery without blocking"""
+        try:
+            self._queue.put_nowait((path, payload))
+        except queue.Full:
+            logging.warning(f"Report queue full, dropping report for {path}")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Stop the worker. Queued reports are spooled first, then delivered for
+        at most timeout seconds; whatever is not delivered stays in the spool.
+        """
+        self._deadline = time.monotonic() + timeout
+        self._stopping.set()
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            # The worker releases the spool and session itself when it exits
+            logging.warning("Reporter still delivering at shutdown, undelivered reports stay spooled")
+
+    def _drain(self) -> List[Report]:
+        """Collect up to batch_size reports, waiting at most flush_interval"""
+        batch: List[Report] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stopping.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain()
+            if self._stopping.is_set():
+                self._shutdown(batch)
+                return
+            try:
+                if len(self._spool) > 0:
+                    # Keep reports in order behind anything already spooled
+                    if batch:
+                        self._spool.extend(batch)
+                    self._replay()
+                elif batch:
+                    sent = self._send(batch)
+                    if sent < len(batch):
+                        self._spool.extend(batch[sent:])
+                        self._next_retry = time.monotonic() + self.retry_interval
+            except Exception as e:
+                logging.error(f"Error in reporter: {str(e)}")
+
+    def _shutdown(self, batch: List[Report]) -> None:
+        """
+        Spool everything still queued without sending it, make one delivery
+        attempt bounded by close()'s deadline, then release the spool
+        """
+        try:
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self._spool.extend(batch)
+            self._replay(deadline=self._deadline)
+        except Exception as e:
+            logging.error(f"Error in reporter: {str(e)}")
+        finally:
+            self._spool.close()
+            self.session.close()
+
+    def _replay(self, deadline: Optional[float] = None) -> None:
+        """
+        Try to deliver spooled reports, oldest first, until one batch fails.
+        Args:
+            deadline: At shutdown, time.monotonic() after which nothing more
+                is sent; the retry interval is ignored
+        """
+        if deadline is None and time.monotonic() < self._next_retry:
+            return
+        while True:
+            timeout = self.timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return
+            elif self._stopping.is_set():
+                return  # Leave the rest to _shutdown
+            rows = self._spool.peek(self.batch_size)
+            if not rows:
+                return
+            sent = self._send([(path, payload) for _, path, payload in rows], timeout)
+            if sent:
+                self._spool.remove_through(rows[sent - 1][0])
+            if sent < len(rows):
+                self._next_retry = time.monotonic() + self.retry_interval
+                return
+            logging.info(f"Replayed {sent} spooled reports")
+
+    def _send(self, batch: List[Report], timeout: Optional[float] = None) -> int:
+        """
+        Post a batch of reports to /observation/batch in one request.
+        Args:
+            timeout: HTTP timeout for this request (default self.timeout)
+        Returns:
+            Number of reports handled (delivered, or rejected by the server as
+            invalid): either the whole batch, or 0 if it should be retried.
+        """
+        records = [dict(payload, type=BATCH_TYPES[path]) for path, payload in batch]
+        url = f"{self.server_url}/observation/batch"
+        timeout = timeout or self.timeout
+        compact = None
+        if self.compact and all(r['type'] in COMPACT_TYPES for r in records):
+            try:
+                compact = encode_records(records)
+            except Exception as e:
+                # e.g. an id too long for the compact layout; the server can
+                # still reject the offending record individually over JSON
+                logging.warning(f"Cannot encode batch compactly, sending JSON: {str(e)}")
+        try:
+            if compact is not None:
+                response = self.session.post(url, data=compact, timeout=timeout,
+                                             headers={'Content-Type': COMPACT_CONTENT_TYPE})
+            else:
+                response = self.session.post(url, json={'records': records}, timeout=timeout)
+        except requests.RequestException as e:
+            logging.warning(f"Server unreachable, spooling reports: {str(e)}")
+            return 0
+        if response.status_code >= 500 or response.status_code in RETRY_STATUSES:
+            logging.warning(f"Server unavailable ({response.status_code}), spooling reports")
+            return 0
+        if not response.ok:
+            # A 4xx for the request as a whole; retrying it will not help
+            logging.error(f"Report batch rejected: {response.text}")
+            return len(batch)
+
+        for error in response.json().get('errors', []):
+            logging.error(f"Report rejected by server: {batch[error['index']][0]} {error['error']}")
+        return len(batch)
@@ -0,0 +1,83 @@
+import hashlib
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Dict, Tuple
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: str
+    etag: str
+
+class ResponseCache:
+    def __init__(self, ttl=5.0, max_entries=256):
+        """
+        Short-lived cache of rendered response bodies, keyed by name.
+        Args:
+            ttl: Seconds a body is served before it is recomputed
+            max_entries: Expired entries are pruned once more keys than this
+                are cached (keys can come from query strings)
+
+        Concurrent misses on one key are coalesced: the first caller
+        computes the body and everyone else waits for its result, so a burst
+        of identical requests runs the underlying queries once. ETags are a
+        hash of the body, so a recomputed but unchanged payload keeps its ETag.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._entries: Dict[str, Tuple[float, CachedResponse]] = {}  # key -> (expiry, response)
+        self._inflight: Dict[str, Future] = {}
+        self._generations: Dict[str, int] = {}  # key -> invalidations while in flight
+
+    def get(self, key: str, compute: Callable[[], str]) -> CachedResponse:
+        """Return the cached body for key, computing it with compute() if stale"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                generation = self._generations.get(key, 0)
+
+        if not owner:
+            return future.result()
+
+        try:
+            body = compute()
+            response = CachedResponse(body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            # Don't keep a body computed before a write that invalidated it
+            if self._generations.pop(key, 0) == generation:
+                now = time.monotonic()
+                if len(self._entries) >= self.max_entries:
+                    self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+                self._entries[key] = (now + self.ttl, response)
+        future.set_result(response)
+        return response
+
+    def invalidate(self, key: str) -> None:
+        """Drop key so the next request sees fresh data"""
+        with self._lock:
+            self._invalidate(key)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        """Drop every key starting with prefix, e.g. all query variants of one endpoint"""
+        with self._lock:
+            for key in [k for k in set(self._entries) | set(self._inflight) if k.startswith(prefix)]:
+                self._invalidate(key)
+
+    def _invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if key in self._inflight:
+            self._generations[key] = self._generations.get(key, 0) + 1
@@ -0,0 +1,141 @@
+import logging
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+
+from app import db
+from models import ArtworkDailyStats, ArtworkHeatmap, ArtworkObservation, DailyVisitor
+
+SUM_COLUMNS = ('observation_count', 'total_time', 'section_1_time', 'section_2_time', 'section_3_time')
+
+def _insert(model):
+    """Dialect-specific INSERT supporting ON CONFLICT, or None if unsupported"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(model)
+
+def apply_observation_rows(rows):
+    """
+    Fold new ArtworkObservation rows (column dicts, as inserted) into the
+    rollup tables. Runs in the caller's transaction; the caller commits.
+    Rows without any time only mark the end of a session and are left out,
+    so they count neither as observations nor as visitors.
+    """
+    stats = defaultdict(lambda: dict.fromkeys(SUM_COLUMNS, 0))
+    visitors = set()
+    for row in rows:
+        if not row.get('total_time'):
+            continue
+        day = row['start_time'].date()
+        group = stats[(day, row['artwork_id'])]
+        group['observation_count'] += 1
+        for column in SUM_COLUMNS[1:]:
+            group[column] += row.get(column) or 0.0
+        visitors.add((day, row['aruco_id']))
+
+    stat_rows = [dict(values, day=day, artwork_id=artwork_id) for (day, artwork_id), values in stats.items()]
+    visitor_rows = [{'day': day, 'aruco_id': aruco_id} for day, aruco_id in visitors]
+    if not stat_rows:
+        return
+
+    stmt = _insert(ArtworkDailyStats)
+    if stmt is None:
+        _apply_with_merge(stat_rows, visitor_rows)
+        return
+
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['day', 'artwork_id'],
+        set_={column: getattr(ArtworkDailyStats, column) + getattr(stmt.excluded, column)
+              for column in SUM_COLUMNS}
+    ), stat_rows)
+    db.session.execute(_insert(DailyVisitor).on_conflict_do_nothing(), visitor_rows)
+
+def _apply_with_merge(stat_rows, visitor_rows):
+    """Row-at-a-time fallback for databases without ON CONFLICT support"""
+    for row in stat_rows:
+        existing = db.session.get(ArtworkDailyStats, (row['day'], row['artwork_id']))
+        if existing is None:
+            db.session.add(ArtworkDailyStats(**row))
+        else:
+            for column in SUM_COLUMNS:
+                setattr(existing, column, getattr(existing, column) + row[column])
+    for row in visitor_rows:
+        db.session.merge(DailyVisitor(**row))
+
+def apply_heatmaps(rows):
+    """
+    Add uploaded occupancy grids (ArtworkHeatmap.row_from_report output) to
+    the per-day heatmaps. Runs in the caller's transaction; the caller commits.
+    """
+    merged = {}
+    for row in rows:
+        key = (row['day'], row['artwork_id'])
+        merged[key] = merged[key] + row['grid'] if key in merged else row['grid'].copy()
+
+    if not merged:
+        return
+
+    stmt = _insert(ArtworkHeatmap)
+    if stmt is not None:
+        # Create missing rows race-free first. This also takes SQLite's write
+        # lock, so the read-modify-write below cannot interleave with another.
+        db.session.execute(stmt.on_conflict_do_nothing(), [
+            {'day': day, 'artwork_id': artwork_id, 'rows': grid.shape[0], 'cols': grid.shape[1],
+             'grid': np.zeros(grid.shape, dtype='<f4').tobytes()}
+            for (day, artwork_id), grid in merged.items()
+        ])
+
+    for (day, artwork_id), grid in merged.items():
+        existing = db.session.get(ArtworkHeatmap, (day, artwork_id), with_for_update=True,
+                                  populate_existing=True)
+        if existing is None:
+            db.session.add(ArtworkHeatmap(day=day, artwork_id=artwork_id, rows=grid.shape[0],
+                                          cols=grid.shape[1], grid=grid.astype('<f4').tobytes()))
+        elif existing.cells.shape != grid.shape:
+            logging.warning(f"Dropping {grid.shape[0]}x{grid.shape[1]} heatmap for {artwork_id}: "
+                            f"the {day} heatmap is {existing.rows}x{existing.cols}")
+        else:
+            existing.grid = (existing.cells + grid).astype('<f4').tobytes()
+
+def rebuild():
+    """Recompute all rollup rows from artwork_observations"""
+    day = db.func.date(ArtworkObservation.start_time)
+    as_date = lambda value: date.fromisoformat(value) if isinstance(value, str) else value
+
+    db.session.query(ArtworkDailyStats).delete()
+    db.session.query(DailyVisitor).delete()
+
+    stats = db.session.query(
+        day,
+        ArtworkObservation.artwork_id,
+        db.func.count(ArtworkObservation.id),
+        db.func.coalesce(db.func.sum(ArtworkObservation.total_time), 0.0),
+        db.func.coalesce(db.func.sum(ArtworkObservation.section_1_time), 0.0),
+        db.func.coalesce(db.func.sum(ArtworkObservation.section_2_time), 0.0),
+        db.func.coalesce(db.func.sum(ArtworkObservation.section_3_time), 0.0)
+    ).filter(ArtworkObservation.total_time > 0).group_by(day, ArtworkObservation.artwork_id).all()
+    stat_rows = [dict(zip(('day', 'artwork_id') + SUM_COLUMNS, (as_date(r[0]),) + tuple(r[1:])))
+                 for r in stats]
+    if stat_rows:
+        db.session.execute(db.insert(ArtworkDailyStats), stat_rows)
+
+    visitors = db.session.query(day, ArtworkObservation.aruco_id)\
+        .filter(ArtworkObservation.total_time > 0).distinct().all()
+    visitor_rows = [{'day': as_date(d), 'aruco_id': aruco_id} for d, aruco_id in visitors]
+    if visitor_rows:
+        db.session.execute(db.insert(DailyVisitor), visitor_rows)
+
+    db.session.commit()
+    logging.info(f"Rebuilt analytics rollups: {len(stat_rows)} artwork-days, {len(visitor_rows)} visitor-days")
+
+def rebuild_if_empty():
+    """Backfill the rollups once for databases that predate them"""
+    if (db.session.query(ArtworkDailyStats.day).first() is None and
+            db.session.query(ArtworkObservation.id).first() is not None):
+        rebuild()
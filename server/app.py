@@ -1,10 +1,15 @@
 import os
+import sys
 import logging
 from flask import Flask, request, jsonify, render_template
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy.orm import DeclarativeBase
 
+# The wire format module is shared with the Pi side at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wire_format import CONTENT_TYPE as COMPACT_CONTENT_TYPE, decode_grid, decode_records
+
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -38,17 +43,71 @@ class ObservationEvent(db.Model):
     event_type = db.Column(db.String(20), nullable=False)  # 'start' or 'update'
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+class HeatmapUpload(db.Model):
+    """One occupancy grid as uploaded by a Pi: dwell seconds per cell since its last report"""
+    id = db.Column(db.Integer, primary_key=True)
+    camera_id = db.Column(db.String(50), nullable=False)
+    artwork_id = db.Column(db.String(50), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    rows = db.Column(db.Integer, nullable=False)
+    cols = db.Column(db.Integer, nullable=False)
+    grid = db.Column(db.LargeBinary, nullable=False)  # float32 cells, row-major
+
+def parse_timestamp(value):
+    """Parse a report timestamp: ISO string, or epoch seconds from the compact wire format"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+    return datetime.fromisoformat(value)
+
+def read_reports():
+    """Return the report records in the request body, JSON or compact binary"""
+    if request.mimetype == COMPACT_CONTENT_TYPE:
+        return decode_records(request.get_data())
+    data = request.json
+    return data['records'] if 'records' in data else [data]
+
+def event_row(data):
+    """Validate a start report and return the ObservationEvent column values"""
+    return {
+        'camera_id': str(data['camera_id']),
+        'artwork_id': str(data['artwork_id']),
+        'aruco_id': int(data['aruco_id']),
+        'event_type': 'start',
+        'timestamp': parse_timestamp(data['timestamp'])
+    }
+
+def observation_row(data):
+    """Validate an update report and return the ArtworkObservation column values"""
+    section_times = data['section_times']
+    # JSON turns the tracker's integer section keys into strings
+    section = lambda n: float(section_times.get(n, section_times.get(str(n), 0.0)))
+    return {
+        'camera_id': str(data['camera_id']),
+        'artwork_id': str(data['artwork_id']),
+        'aruco_id': int(data['aruco_id']),
+        'timestamp': parse_timestamp(data['timestamp']),
+        'section_1_time': section(1),
+        'section_2_time': section(2),
+        'section_3_time': section(3),
+        'total_time': float(data['total_time'])
+    }
+
+def heatmap_row(data):
+    """Validate a heatmap report and return the HeatmapUpload column values"""
+    rows, cols = int(data['rows']), int(data['cols'])
+    return {
+        'camera_id': str(data['camera_id']),
+        'artwork_id': str(data['artwork_id']),
+        'timestamp': parse_timestamp(data['timestamp']),
+        'rows': rows,
+        'cols': cols,
+        'grid': decode_grid(data['grid'], rows, cols).tobytes()
+    }
+
 @app.route('/observation/start', methods=['POST'])
 def start_observation():
     try:
-        data = request.json
-        event = ObservationEvent(
-            camera_id=data['camera_id'],
-            artwork_id=data['artwork_id'],
-            aruco_id=data['aruco_id'],
-            event_type='start',
-            timestamp=datetime.fromisoformat(data['timestamp'])
-        )
+        event = ObservationEvent(**event_row(read_reports()[0]))
         db.session.add(event)
         db.session.commit()
         return jsonify({'success': True})
@@ -58,23 +117,54 @@ def start_observation():
 @app.route('/observation/update', methods=['POST'])
 def update_observation():
     try:
-        data = request.json
-        observation = ArtworkObservation(
-            camera_id=data['camera_id'],
-            artwork_id=data['artwork_id'],
-            aruco_id=data['aruco_id'],
-            timestamp=datetime.fromisoformat(data['timestamp']),
-            section_1_time=data['section_times'][1],
-            section_2_time=data['section_times'][2],
-            section_3_time=data['section_times'][3],
-            total_time=data['total_time']
-        )
+        observation = ArtworkObservation(**observation_row(read_reports()[0]))
         db.session.add(observation)
         db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/observation/heatmap', methods=['POST'])
+def heatmap_observation():
+    try:
+        db.session.add(HeatmapUpload(**heatmap_row(read_reports()[0])))
+        db.session.commit()
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/observation/batch', methods=['POST'])
+def batch_observations():
+    """
+    Ingest many start/update/heatmap reports in one request with one set-based
+    insert per table. Invalid records are reported by index and skipped.
+    """
+    try:
+        records = read_reports()
+        parsers = {
+            'start': (ObservationEvent, event_row),
+            'update': (ArtworkObservation, observation_row),
+            'heatmap': (HeatmapUpload, heatmap_row),
+        }
+        rows = {model: [] for model, _ in parsers.values()}
+        errors = []
+        for index, record in enumerate(records):
+            try:
+                model, parse = parsers[record.get('type')]
+                rows[model].append(parse(record))
+            except Exception as e:
+                errors.append({'index': index, 'error': f"{type(e).__name__}: {str(e)}"})
+
+        for model, model_rows in rows.items():
+            if model_rows:
+                db.session.execute(db.insert(model), model_rows)
+        db.session.commit()
+        return jsonify({'success': True, 'accepted': len(records) - len(errors), 'errors': errors})
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error in batch ingest: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/dashboard')
 def dashboard():
     return render_template('dashboard.html')
@@ -0,0 +1,68 @@
+"""
+Tuned settings for running the app on a SQLite file.
+
+Default SQLite serializes readers behind writers (rollback journal), fsyncs
+on every commit and fails with "database is locked" as soon as two
+connections want to write. For single-site and edge installs on SQLite the
+engine instead gets:
+
+    journal_mode=WAL        readers no longer block on, or block, the writer
+    synchronous=NORMAL      fsync at checkpoints instead of every commit
+                            (durable across process crashes; a power loss
+                            can lose only the last transactions)
+    cache_size=-65536       64 MiB page cache per connection
+    mmap_size=268435456     256 MiB memory-mapped reads
+    temp_store=MEMORY       sorts and temp tables in memory
+    busy_timeout            writers wait for the lock instead of failing
+
+and a connection pool sized for a threaded server.
+"""
+import os
+
+from sqlalchemy import event
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+def is_sqlite_file(url):
+    """True for sqlite URLs pointing at a file (not in-memory databases)"""
+    if not url or not url.startswith('sqlite'):
+        return False
+    path = url.split('///', 1)[1] if '///' in url else ''
+    return path not in ('', ':memory:') and 'mode=memory' not in path
+
+def busy_timeout():
+    """Seconds a connection waits for the write lock (SQLITE_BUSY_TIMEOUT, default 10)"""
+    return float(os.environ.get('SQLITE_BUSY_TIMEOUT', 10))
+
+def engine_options(pool_size=None):
+    """
+    create_engine() options for a tuned SQLite file database.
+    Args:
+        pool_size: Pooled connections (default SQLITE_POOL_SIZE, 20); one per
+            request thread avoids waiting on the pool
+    """
+    pool_size = pool_size or int(os.environ.get('SQLITE_POOL_SIZE', 20))
+    return {
+        'pool_size': pool_size,
+        'max_overflow': pool_size,
+        'pool_timeout': 30,
+        'connect_args': {'timeout': busy_timeout(), 'check_same_thread': False},
+    }
+
+def apply(engine):
+    """Set PRAGMAS and the busy timeout on every new connection of engine"""
+    timeout_ms = int(busy_timeout() * 1000)
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout={timeout_ms}')
+        for name, value in PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
@@ -6,6 +6,7 @@ let drawCtx = drawCanvas.getContext('2d');
 let isDrawing = false;
 let startX, startY;
 let regions = [];  // Store box regions
+const MAX_REGIONS = 3;  // Matches the section_1..3 columns on the server
 let streamUrl = null;
 
 // Generate a unique color for each region
@@ -64,6 +65,14 @@ drawCanvas.addEventListener('mouseup', function(e) {
     const endX = e.clientX - rect.left;
     const endY = e.clientY - rect.top;
 
+    // Observations store time for at most three sections
+    if (regions.length >= MAX_REGIONS) {
+        isDrawing = false;
+        redrawRegions();
+        alert(`At most ${MAX_REGIONS} regions are supported`);
+        return;
+    }
+
     // Add new region with unique color
     regions.push({
         id: Date.now(),
@@ -128,6 +137,18 @@ function deleteRegion(id) {
     updateRegionsTable();
 }
 
+// Convert a box drawn on the canvas to a polygon in normalized (0-1) frame coordinates
+function normalizeRegion(region) {
+    const x0 = region.x / drawCanvas.width;
+    const y0 = region.y / drawCanvas.height;
+    const x1 = (region.x + region.width) / drawCanvas.width;
+    const y1 = (region.y + region.height) / drawCanvas.height;
+    return {
+        name: region.name,
+        points: [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+    };
+}
+
 // Button handlers
 document.getElementById('startDrawing').addEventListener('click', function() {
     this.classList.toggle('active');
@@ -148,7 +169,7 @@ document.getElementById('saveRegions').addEventListener('click', async function(
             },
             body: JSON.stringify({
                 camera_url: streamUrl,
-                regions: regions
+                regions: regions.map(normalizeRegion)
             })
         });
 
@@ -1,60 +1,100 @@
-// Fetch and update dashboard data
-function updateDashboard() {
-    fetch('/api/analytics')
+// Render an analytics payload, fetched or pushed by the server
+function renderDashboard(data) {
+    if (data.error) {
+        console.error('Error from server:', data.error);
+        return;
+    }
+
+    // Update statistics cards
+    document.querySelector('#totalVisitors').textContent = data.total_visitors || '0';
+    document.querySelector('#activeCameras').textContent = data.active_cameras || '0';
+    document.querySelector('#avgTimeSpent').textContent = `${data.avg_time || '0'} min`;
+    document.querySelector('#popularArtwork').textContent = data.popular_artwork || 'N/A';
+
+    // Update recent observations table
+    const tbody = document.querySelector('#recentObservations');
+    if (data.recent_observations && data.recent_observations.length > 0) {
+        tbody.innerHTML = data.recent_observations.map(obs => `
+            <tr>
+                <td>${obs.aruco_id || 'Unknown'}</td>
+                <td>${obs.artwork_id || 'Unknown'}</td>
+                <td>${obs.time_spent || '0 min'}</td>
+                <td>${obs.sections || 'None'}</td>
+                <td>${obs.timestamp || 'N/A'}</td>
+            </tr>
+        `).join('');
+    } else {
+        tbody.innerHTML = '<tr><td colspan="5" class="text-center">No recent observations</td></tr>';
+    }
+
+    // Update time per section chart
+    if (window.timeChart) {
+        const sectionTimes = [
+            data.section_times?.section_1 || 0,
+            data.section_times?.section_2 || 0,
+            data.section_times?.section_3 || 0
+        ];
+        window.timeChart.data.datasets[0].data = sectionTimes;
+        window.timeChart.update();
+    }
+}
+
+// Draw visitors per hour over the last 24 hours from the bucketed series API
+function updateVisitorFlow() {
+    if (!window.flowChart) return;
+    fetch('/api/analytics/series?bucket=hour')
         .then(response => response.json())
         .then(data => {
-            if (data.error) {
-                console.error('Error from server:', data.error);
-                return;
-            }
-
-            // Update statistics cards
-            document.querySelector('#totalVisitors').textContent = data.total_visitors || '0';
-            document.querySelector('#activeCameras').textContent = data.active_cameras || '0';
-            document.querySelector('#avgTimeSpent').textContent = `${data.avg_time || '0'} min`;
-            document.querySelector('#popularArtwork').textContent = data.popular_artwork || 'N/A';
+            const points = data.series && data.series.length ? data.series[0].points : [];
+            window.flowChart.data.labels = points.map(p =>
+                new Date(p.start + 'Z').toLocaleTimeString([], {hour: 'numeric'}));
+            window.flowChart.data.datasets[0].data = points.map(p => p.visitors);
+            window.flowChart.update();
+        })
+        .catch(error => console.error('Error updating visitor flow:', error));
+}
 
-            // Update recent observations table
-            const tbody = document.querySelector('#recentObservations');
-            if (data.recent_observations && data.recent_observations.length > 0) {
-                tbody.innerHTML = data.recent_observations.map(obs => `
-                    <tr>
-                        <td>${obs.aruco_id || 'Unknown'}</td>
-                        <td>${obs.artwork_id || 'Unknown'}</td>
-                        <td>${obs.time_spent || '0 min'}</td>
-                        <td>${obs.sections || 'None'}</td>
-                        <td>${obs.timestamp || 'N/A'}</td>
-                    </tr>
-                `).join('');
-            } else {
-                tbody.innerHTML = '<tr><td colspan="5" class="text-center">No recent observations</td></tr>';
-            }
+// Draw today's dwell heatmap of the selected artwork: brighter cells are
+// where visitors spent more time in front of it
+function renderHeatmap(data) {
+    const canvas = document.getElementById('heatmapCanvas');
+    const ctx = canvas.getContext('2d');
+    canvas.width = canvas.clientWidth;
+    canvas.height = Math.round(canvas.width * data.rows / data.cols);
+    const cellWidth = canvas.width / data.cols;
+    const cellHeight = canvas.height / data.rows;
 
-            // Update time per section chart
-            if (window.timeChart) {
-                const sectionTimes = [
-                    data.section_times?.section_1 || 0,
-                    data.section_times?.section_2 || 0,
-                    data.section_times?.section_3 || 0
-                ];
-                window.timeChart.data.datasets[0].data = sectionTimes;
-                window.timeChart.update();
-            }
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    data.grid.forEach((row, y) => row.forEach((seconds, x) => {
+        if (!seconds) return;
+        ctx.fillStyle = `rgba(255, 99, 71, ${(seconds / data.max).toFixed(3)})`;
+        ctx.fillRect(x * cellWidth, y * cellHeight, Math.ceil(cellWidth), Math.ceil(cellHeight));
+    }));
+}
 
-            // Update visitor flow chart with real data if available
-            if (window.flowChart && data.recent_observations) {
-                const hourCounts = new Array(7).fill(0); // 9 AM to 3 PM
-                data.recent_observations.forEach(obs => {
-                    const hour = new Date(obs.timestamp).getHours();
-                    const index = hour - 9; // 9 AM is index 0
-                    if (index >= 0 && index < 7) {
-                        hourCounts[index]++;
-                    }
-                });
-                window.flowChart.data.datasets[0].data = hourCounts;
-                window.flowChart.update();
-            }
+function updateHeatmap() {
+    const select = document.getElementById('heatmapArtwork');
+    fetch('/api/heatmap')
+        .then(response => response.json())
+        .then(data => {
+            const selected = select.value;
+            select.innerHTML = (data.artworks || []).map(id => `<option value="${id}">${id}</option>`).join('');
+            if (data.artworks && data.artworks.includes(selected)) select.value = selected;
+            if (!select.value) return null;
+            return fetch(`/api/heatmap?artwork_id=${encodeURIComponent(select.value)}`)
+                .then(response => response.json());
         })
+        .then(data => { if (data && data.grid) renderHeatmap(data); })
+        .catch(error => console.error('Error updating heatmap:', error));
+}
+
+// Fetch and update dashboard data
+function updateDashboard() {
+    updateVisitorFlow();
+    updateHeatmap();
+    fetch('/api/analytics')
+        .then(response => response.json())
+        .then(renderDashboard)
         .catch(error => {
             console.error('Error updating dashboard:', error);
             // Handle error state in UI
@@ -111,10 +151,10 @@ document.addEventListener('DOMContentLoaded', function() {
     window.flowChart = new Chart(flowCtx, {
         type: 'line',
         data: {
-            labels: ['9 AM', '10 AM', '11 AM', '12 PM', '1 PM', '2 PM', '3 PM'],
+            labels: [],
             datasets: [{
                 label: 'Number of Visitors',
-                data: [0, 0, 0, 0, 0, 0, 0],
+                data: [],
                 fill: true,
                 borderColor: 'rgb(75, 192, 192)',
                 backgroundColor: 'rgba(75, 192, 192, 0.2)',
@@ -135,7 +175,19 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
-    // Update dashboard immediately and then every 30 seconds
+    document.getElementById('heatmapArtwork').addEventListener('change', updateHeatmap);
+
+    // Update dashboard immediately, then whenever the server pushes new
+    // analytics (or every 30 seconds in browsers without EventSource)
     updateDashboard();
-    setInterval(updateDashboard, 30000);
+    if (window.EventSource) {
+        const events = new EventSource('/events?topics=analytics');
+        events.addEventListener('analytics', e => {
+            renderDashboard(JSON.parse(e.data));
+            updateVisitorFlow();
+            updateHeatmap();
+        });
+    } else {
+        setInterval(updateDashboard, 30000);
+    }
 });
\ No newline at end of file
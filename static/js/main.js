@@ -1,5 +1,7 @@
 let currentArucoId = null;
 let currentStatus = null;
+let lastDetection = null;  // Latest status pushed by the server
+let showingResult = false;  // Keep a check-in/out result on screen briefly
 
 function updateStatus(message, type = 'info') {
     const statusDiv = document.getElementById('status');
@@ -14,53 +16,57 @@ function updateActionButton(enabled, isCheckout = false) {
     button.className = `btn ${isCheckout ? 'btn-warning' : 'btn-primary'} w-100 mb-3`;
 }
 
+function renderHistory(history) {
+    const historyDiv = document.getElementById('history');
+    historyDiv.innerHTML = history.map(entry => `
+        <div class="history-item">
+            <div>
+                <span class="badge bg-secondary">${entry.aruco_id}</span>
+                <span class="badge ${entry.status === 'checked_in' ? 'bg-success' : 'bg-warning'}">
+                    ${entry.status === 'checked_in' ? 'In' : 'Out'}
+                </span>
+            </div>
+            <small class="text-muted">
+                ${entry.status === 'checked_in' ? entry.timestamp : 
+                  `${entry.timestamp} - ${entry.checkout_time}`}
+            </small>
+        </div>
+    `).join('');
+}
+
 function updateHistory() {
     fetch('/get_history')
         .then(response => response.json())
-        .then(history => {
-            const historyDiv = document.getElementById('history');
-            historyDiv.innerHTML = history.map(entry => `
-                <div class="history-item">
-                    <div>
-                        <span class="badge bg-secondary">${entry.aruco_id}</span>
-                        <span class="badge ${entry.status === 'checked_in' ? 'bg-success' : 'bg-warning'}">
-                            ${entry.status === 'checked_in' ? 'In' : 'Out'}
-                        </span>
-                    </div>
-                    <small class="text-muted">
-                        ${entry.status === 'checked_in' ? entry.timestamp : 
-                          `${entry.timestamp} - ${entry.checkout_time}`}
-                    </small>
-                </div>
-            `).join('');
-        });
+        .then(renderHistory);
+}
+
+function renderDetection(data) {
+    if (data.detected && data.aruco_id) {
+        currentArucoId = data.aruco_id;
+        currentStatus = data.status;
+
+        if (data.status === 'can_checkin') {
+            updateStatus(`ArUco code ${data.aruco_id} detected! Ready for check-in.`, 'success');
+            updateActionButton(true, false);
+        } else if (data.status === 'can_checkout') {
+            updateStatus(`ArUco code ${data.aruco_id} is checked in. You can check out.`, 'warning');
+            updateActionButton(true, true);
+        } else if (data.status === 'cooldown') {
+            updateStatus(`Please wait before checking in ArUco ${data.aruco_id} again.`, 'info');
+            updateActionButton(false);
+        }
+    } else {
+        updateStatus('Position ArUco code in the center box...', 'info');
+        updateActionButton(false);
+        currentArucoId = null;
+        currentStatus = null;
+    }
 }
 
 function checkAruco() {
     fetch('/check_aruco')
         .then(response => response.json())
-        .then(data => {
-            if (data.detected && data.aruco_id) {
-                currentArucoId = data.aruco_id;
-                currentStatus = data.status;
-
-                if (data.status === 'can_checkin') {
-                    updateStatus(`ArUco code ${data.aruco_id} detected! Ready for check-in.`, 'success');
-                    updateActionButton(true, false);
-                } else if (data.status === 'can_checkout') {
-                    updateStatus(`ArUco code ${data.aruco_id} is checked in. You can check out.`, 'warning');
-                    updateActionButton(true, true);
-                } else if (data.status === 'cooldown') {
-                    updateStatus(`Please wait before checking in ArUco ${data.aruco_id} again.`, 'info');
-                    updateActionButton(false);
-                }
-            } else {
-                updateStatus('Position ArUco code in the center box...', 'info');
-                updateActionButton(false);
-                currentArucoId = null;
-                currentStatus = null;
-            }
-        });
+        .then(renderDetection);
 }
 
 document.getElementById('checkinBtn').addEventListener('click', () => {
@@ -74,10 +80,16 @@ document.getElementById('checkinBtn').addEventListener('click', () => {
             if (data.success) {
                 const action = endpoint === 'checkout' ? 'out' : 'in';
                 updateStatus(`Check-${action} successful for ArUco ${currentArucoId}!`, 'success');
-                updateHistory();
+                if (!events) updateHistory();  // Otherwise the server pushes the new history
+                showingResult = true;
                 setTimeout(() => {
-                    updateStatus('Position ArUco code in the center box...', 'info');
-                    updateActionButton(false);
+                    showingResult = false;
+                    if (events && lastDetection) {
+                        renderDetection(lastDetection);
+                    } else {
+                        updateStatus('Position ArUco code in the center box...', 'info');
+                        updateActionButton(false);
+                    }
                 }, 2000);
             } else {
                 updateStatus(data.error || 'Operation failed', 'danger');
@@ -85,6 +97,17 @@ document.getElementById('checkinBtn').addEventListener('click', () => {
         });
 });
 
-// Start periodic checks
-setInterval(checkAruco, 1000);
+// Detection and history changes are pushed by the server; fall back to
+// polling in browsers without EventSource
+let events = null;
+if (window.EventSource) {
+    events = new EventSource('/events?topics=detection,history');
+    events.addEventListener('detection', e => {
+        lastDetection = JSON.parse(e.data);
+        if (!showingResult) renderDetection(lastDetection);
+    });
+    events.addEventListener('history', e => renderHistory(JSON.parse(e.data)));
+} else {
+    setInterval(checkAruco, 1000);
+}
 updateHistory();
\ No newline at end of file
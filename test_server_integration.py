@@ -46,18 +46,17 @@ def simulate_observations():
                     
                     # Calculate timestamps
                     start_time = datetime.utcnow() - timedelta(minutes=5)
-                    end_time = datetime.utcnow()
-                    
+
                     data = {
                         "camera_id": camera["camera_id"],
                         "artwork_id": artwork_id,
                         "aruco_id": aruco_id,
-                        "start_time": start_time.isoformat(),
-                        "end_time": end_time.isoformat(),
-                        "section_times": section_times
+                        "timestamp": start_time.isoformat(),
+                        "section_times": section_times,
+                        "total_time": sum(section_times.values())
                     }
-                    
-                    response = requests.post(f"{SERVER_URL}/api/observation/update", json=data)
+
+                    response = requests.post(f"{SERVER_URL}/observation/update", json=data)
                     if response.status_code == 200:
                         print(f"Sent observation for camera {camera['camera_id']}, artwork {artwork_id}")
                     else:
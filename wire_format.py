@@ -0,0 +1,154 @@
+"""
+Compact binary encoding for batches of tracker reports.
+
+Layout (little endian), gzip-compressed on the wire:
+    magic            4s    b'ARW3'
+    num_strings      H     entries in the string table
+    num_sections     B     section times per update record
+    num_starts       I
+    num_updates      I
+    strings          num_strings x (H length + utf-8 bytes)
+    order            (num_starts + num_updates) x B: 0 = start, 1 = update,
+                     in the order the records were given
+    start records    num_starts x (H camera, H artwork, H aruco_id, d epoch)
+    update records   num_updates x (H camera, H artwork, H aruco_id, d epoch,
+                                    d start, d end, f total_time, num_sections x f)
+
+camera_id/artwork_id are stored once in the string table and referenced by
+index. Records use the same dict shape as /observation/batch JSON records,
+with 'timestamp' as epoch seconds (UTC), and decode in their original order,
+so per-record errors from the server index the batch as it was sent.
+start/end carry the session bounds of a session's final update and are NaN
+on other updates. Older payloads are still decoded, starts first: b'ARW2'
+(1-byte string lengths, no order) and b'ARW1' (also no start/end).
+
+Values the layout cannot hold (e.g. an id over 65535 bytes) raise
+struct.error; senders fall back to JSON for such batches.
+
+Heatmap records carry their occupancy grid as 'grid': base64 of the
+zlib-compressed float32 cells in row-major order (see encode_grid). They are
+only sent as JSON.
+"""
+import base64
+import gzip
+import math
+import struct
+import zlib
+from datetime import datetime, timezone
+from typing import List
+
+import numpy as np
+
+CONTENT_TYPE = 'application/x-aruco-reports'
+
+MAGIC = b'ARW3'
+MAGIC_V2 = b'ARW2'
+MAGIC_V1 = b'ARW1'
+HEADER = struct.Struct('<4sHBII')
+START = struct.Struct('<HHHd')
+
+def to_epoch(timestamp) -> float:
+    """Convert an ISO string (naive = UTC) or epoch number to epoch seconds"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    value = datetime.fromisoformat(timestamp)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def encode_grid(grid: np.ndarray) -> str:
+    """Compress a 2-D occupancy grid for a JSON heatmap record"""
+    return base64.b64encode(zlib.compress(grid.astype('<f4').tobytes(), 6)).decode('ascii')
+
+def decode_grid(data: str, rows: int, cols: int) -> np.ndarray:
+    """Inverse of encode_grid"""
+    return np.frombuffer(zlib.decompress(base64.b64decode(data)), dtype='<f4').reshape(rows, cols)
+
+def _update_struct(num_sections: int, version: bytes = MAGIC) -> struct.Struct:
+    if version == MAGIC_V1:
+        return struct.Struct(f'<HHHdf{num_sections}f')
+    return struct.Struct(f'<HHHdddf{num_sections}f')
+
+def encode_records(records: List[dict], compress: bool = True) -> bytes:
+    """Encode batch records ({'type': 'start' | 'update', ...}) into the compact format"""
+    strings = {}
+    index = lambda value: strings.setdefault(str(value), len(strings))
+
+    starts = [r for r in records if r['type'] == 'start']
+    updates = [r for r in records if r['type'] == 'update']
+    num_sections = max((max(int(k) for k in r['section_times']) for r in updates if r['section_times']),
+                       default=0)
+    update = _update_struct(num_sections)
+
+    body = bytearray()
+    for r in starts:
+        body += START.pack(index(r['camera_id']), index(r['artwork_id']), int(r['aruco_id']),
+                           to_epoch(r['timestamp']))
+    for r in updates:
+        times = {int(k): v for k, v in r['section_times'].items()}
+        bound = lambda key: to_epoch(r[key]) if r.get(key) is not None else math.nan
+        body += update.pack(index(r['camera_id']), index(r['artwork_id']), int(r['aruco_id']),
+                            to_epoch(r['timestamp']), bound('start_time'), bound('end_time'),
+                            float(r['total_time']),
+                            *(float(times.get(s, 0.0)) for s in range(1, num_sections + 1)))
+
+    table = bytearray()
+    for value in strings:
+        encoded = value.encode('utf-8')
+        table += struct.pack('<H', len(encoded)) + encoded
+    order = bytes(int(r['type'] == 'update') for r in records if r['type'] in ('start', 'update'))
+
+    payload = HEADER.pack(MAGIC, len(strings), num_sections, len(starts), len(updates)) + table + order + body
+    return gzip.compress(payload, compresslevel=6) if compress else bytes(payload)
+
+def decode_records(data: bytes) -> List[dict]:
+    """Decode a (optionally gzip-compressed) compact payload into batch records"""
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+
+    magic, num_strings, num_sections, num_starts, num_updates = HEADER.unpack_from(data)
+    if magic not in (MAGIC, MAGIC_V2, MAGIC_V1):
+        raise ValueError("Not a compact report payload")
+    offset = HEADER.size
+
+    length_size = 2 if magic == MAGIC else 1
+    strings = []
+    for _ in range(num_strings):
+        length = int.from_bytes(data[offset:offset + length_size], 'little')
+        offset += length_size
+        strings.append(data[offset:offset + length].decode('utf-8'))
+        offset += length
+
+    order = None
+    if magic == MAGIC:
+        order = data[offset:offset + num_starts + num_updates]
+        offset += num_starts + num_updates
+
+    starts = []
+    end = offset + START.size * num_starts
+    for camera, artwork, aruco_id, timestamp in START.iter_unpack(data[offset:end]):
+        starts.append({'type': 'start', 'camera_id': strings[camera], 'artwork_id': strings[artwork],
+                       'aruco_id': aruco_id, 'timestamp': timestamp})
+    offset = end
+
+    updates = []
+    update = _update_struct(num_sections, magic)
+    end = offset + update.size * num_updates
+    for values in update.iter_unpack(data[offset:end]):
+        if magic == MAGIC_V1:
+            camera, artwork, aruco_id, timestamp, total_time, *times = values
+            start = finish = math.nan
+        else:
+            camera, artwork, aruco_id, timestamp, start, finish, total_time, *times = values
+        record = {'type': 'update', 'camera_id': strings[camera], 'artwork_id': strings[artwork],
+                  'aruco_id': aruco_id, 'timestamp': timestamp, 'total_time': total_time,
+                  'section_times': dict(enumerate(times, start=1))}
+        if not math.isnan(start):
+            record['start_time'] = start
+            record['end_time'] = finish
+        updates.append(record)
+
+    if order is None:
+        return starts + updates
+    by_kind = (iter(starts), iter(updates))
+    return [next(by_kind[kind]) for kind in order]
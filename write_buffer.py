@@ -0,0 +1,130 @@
+import atexit
+import logging
+import queue
+import time
+from concurrent.futures import Future
+from threading import Event, Thread
+
+class WriteBehindBuffer:
+    def __init__(self, app, db, flush_size=500, flush_interval=0.05, durability='flush',
+                 max_pending=50000, on_flush=None, before_commit=None, merged_models=()):
+        """
+        Group-commit buffer for ingest writes.
+        Args:
+            app: Flask app whose context the flusher runs in
+            db: Flask-SQLAlchemy instance
+            flush_size: Commit as soon as this many rows are pending
+            flush_interval: Commit pending rows at least this often, in seconds.
+                Only 'enqueue' waits this long for a group to fill; with
+                'flush' callers are blocked, so pending rows are committed as
+                soon as the previous commit is done
+            durability: 'flush' - submit() returns a Future the request waits on,
+                so the client is only acknowledged once its rows are committed;
+                'enqueue' - the client is acknowledged once the rows are queued,
+                and rows still in memory are lost if the process dies
+            max_pending: Bound on queued submissions; submit() raises queue.Full
+                beyond it so callers can shed load
+            on_flush: Called with {model: rows} after every successful commit
+            before_commit: Called with {model: rows} inside the transaction, after
+                the inserts (e.g. to maintain rollup tables)
+            merged_models: Models whose rows are not inserted but left to
+                before_commit to fold into existing rows
+
+        Requests hand rows to a single flusher thread that writes everything
+        pending with one executemany insert per table and one commit, so
+        per-transaction fsync and lock costs are paid per group, not per row.
+        """
+        if durability not in ('flush', 'enqueue'):
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.app = app
+        self.db = db
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.on_flush = on_flush
+        self.before_commit = before_commit
+        self.merged_models = tuple(merged_models)
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stopping = Event()
+        self._thread = Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, rows_by_model):
+        """
+        Queue {model: [column dicts]} for insertion.
+        Returns:
+            Future resolved (or failed) once the rows are committed
+        """
+        future = Future()
+        self._queue.put_nowait((rows_by_model, future))
+        return future
+
+    def close(self, timeout=30):
+        """Flush everything pending and stop the flusher"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join(timeout=timeout)
+
+    def _collect(self):
+        """
+        Gather submissions until flush_size rows are pending or, with
+        'enqueue', flush_interval passes. With 'flush' the group is whatever
+        queued up while the previous one was being committed.
+        """
+        items = []
+        pending_rows = 0
+        try:
+            items.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return items
+        pending_rows += sum(len(rows) for rows in items[0][0].values())
+
+        linger = self.flush_interval if self.durability == 'enqueue' else 0.0
+        deadline = time.monotonic() + linger
+        while pending_rows < self.flush_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            items.append(item)
+            pending_rows += sum(len(rows) for rows in item[0].values())
+        return items
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            items = self._collect()
+            if items:
+                self._flush(items)
+
+    def _flush(self, items):
+        grouped = {}
+        for rows_by_model, _ in items:
+            for model, rows in rows_by_model.items():
+                grouped.setdefault(model, []).extend(rows)
+
+        with self.app.app_context():
+            try:
+                for model, rows in grouped.items():
+                    if rows and model not in self.merged_models:
+                        self.db.session.execute(self.db.insert(model), rows)
+                if self.before_commit:
+                    self.before_commit(grouped)
+                self.db.session.commit()
+            except Exception as e:
+                self.db.session.rollback()
+                logging.error(f"Write-behind flush of {len(items)} submissions failed: {str(e)}")
+                for _, future in items:
+                    future.set_exception(e)
+                return
+
+        for _, future in items:
+            future.set_result(True)
+        if self.on_flush:
+            try:
+                self.on_flush(grouped)
+            except Exception as e:
+                logging.error(f"Error after write-behind flush: {str(e)}")